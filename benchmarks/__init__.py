@@ -0,0 +1,21 @@
+"""Benchmarks of the simulation hot paths.
+
+    python -m benchmarks                 # compare against benchmarks/baseline.json
+    python -m benchmarks --quick -k simulate
+    python -m benchmarks --save          # record a new baseline
+
+Every case times one hot path on seeded synthetic inputs, and cases of the
+same path vary one parameter at a time (grid size, number of objects, pattern
+resolution, ...) to show how it scales. The GUI methods are thin wrappers, so
+the engine functions behind them are measured without a display:
+
+    BTS.calc_signal_map        kbsim.calc_signal_map
+    BTS.check_signal           kbsim.check_signal, kbsim.pair_line_of_sight
+    Obstacle.add_self_to_map   kbsim.Obstacle.add_to_map, ObstacleRaster.update
+    pattern_from_msi_file      patterns.pattern_from_msi_file
+    generate_mesh              patterns.generate_mesh
+    sim_frame.run_sim          kbsim.simulate
+
+Timings are scaled by a fixed calibration workload before they are compared,
+so a baseline recorded on another machine stays roughly usable.
+"""
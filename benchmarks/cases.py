@@ -0,0 +1,283 @@
+"""Seeded synthetic inputs and the benchmark cases"""
+
+from collections.abc import Callable
+from dataclasses import replace
+from typing import NamedTuple, Optional
+import io
+import itertools
+import numpy as np
+import kbsim
+from patterns import (
+    HALF_WAVE_DIPOLE,
+    generate_mesh,
+    pattern_from_msi_file,
+    sphere_pattern,
+    structured_mesh,
+)
+
+SEED = 1234
+"""Seed of every synthetic input, change it to benchmark other layouts"""
+
+
+def synthetic_msi(points: int, seed: int = SEED) -> str:
+    """Contents of an MSI file sampling both planes at `points` angles"""
+    rng = np.random.default_rng(seed)
+    angles = np.arange(points) * 360 / points
+    lines = ["NAME SYNTHETIC", "FREQUENCY 900", "GAIN 15.0 dBi", "TILT ELECTRICAL"]
+    for plane, width in (("HORIZONTAL", 1.0), ("VERTICAL", 4.0)):
+        # a main lobe with ripple, attenuation in dB relative to the peak
+        loss = 20 * (1 - np.cos(np.radians(angles))) * width
+        loss = np.minimum(loss + rng.uniform(0, 1, points), 40)
+        lines.append(f"{plane} {points}")
+        lines += [f"{a:.4f} {v:.5f}" for a, v in zip(angles, loss)]
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_scenario(
+    base_stations: int,
+    user_equipment: int,
+    obstacles: int,
+    seed: int = SEED,
+    extent: tuple[int, int] = kbsim.SIM_SIZE,
+) -> kbsim.Scenario:
+    """Random layout of dipole base stations, UEs and obstacles of all materials
+
+    Base stations cover a few hundred cells around them, like the defaults of
+    the GUI with a stronger transmitter.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = extent
+
+    def position() -> tuple[int, int]:
+        return int(rng.integers(width)), int(rng.integers(height))
+
+    stations = [
+        kbsim.BaseStation(
+            f"BTS{i}",
+            *position(),
+            power=float(rng.uniform(40, 50)),
+            height=float(rng.uniform(10, 50)),
+            angle=int(rng.integers(360)),
+        )
+        for i in range(base_stations)
+    ]
+    ues = [kbsim.UserEquipment(f"UE{i}", *position()) for i in range(user_equipment)]
+    materials = list(kbsim.MATERIALS)
+    obs = [
+        kbsim.Obstacle(
+            f"OB{i}",
+            *position(),
+            size=int(rng.integers(2, 21)),
+            material=materials[rng.integers(len(materials))],
+            height=float(rng.uniform(5, 60)),
+        )
+        for i in range(obstacles)
+    ]
+    return kbsim.Scenario(
+        width, height, stations, ues, obs, grid=kbsim.Grid(extent=extent)
+    )
+
+
+class Case(NamedTuple):
+    name: str
+    """Hot path measured by the case"""
+    params: dict
+    setup: Callable[..., Callable[[], object]]
+    """Builds the inputs untimed and returns the function to time"""
+    quick: bool = True
+    """Also run with `--quick`"""
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}[{','.join(f'{k}={v}' for k, v in self.params.items())}]"
+
+
+def _sweep(
+    name: str,
+    setup: Callable[..., Callable[[], object]],
+    defaults: dict,
+    slow: Optional[dict] = None,
+    **axes,
+) -> list[Case]:
+    """Cases varying one parameter of `defaults` at a time
+
+    Args:
+        slow (dict, optional): values of an axis only run without `--quick`
+    """
+    slow = slow or {}
+    cases: dict[str, Case] = {}
+    for axis, values in axes.items():
+        for value in values:
+            case = Case(
+                name, {**defaults, axis: value}, setup, value not in slow.get(axis, ())
+            )
+            cases.setdefault(case.id, case)
+    return list(cases.values())
+
+
+def _extent(text: str) -> tuple[int, int]:
+    width, height = text.split("x")
+    return int(width), int(height)
+
+
+PATTERNS = {
+    "dipole": HALF_WAVE_DIPOLE,
+    "sphere": sphere_pattern(HALF_WAVE_DIPOLE),
+    "msi": pattern_from_msi_file(io.StringIO(synthetic_msi(360))),
+}
+"""Patterns of the base stations, separable and full-sphere"""
+
+
+def _calc_signal_map(extent, pattern, angle_step, refine, model):
+    grid = kbsim.Grid(extent=_extent(extent), angle_step=angle_step, refine=refine)
+    args = (45.0, 30.0, 30, 0, PATTERNS[pattern], grid, kbsim.MODELS[model])
+    mask = kbsim.calc_signal_map(*args)  # build the geometry tables of the grid
+    if refine > 1:  # coarse-to-fine has to match the table path exactly
+        exact = kbsim.calc_signal_map(*args[:5], replace(grid, refine=1), *args[6:])
+        if not np.array_equal(mask, exact):
+            raise AssertionError(f"refine={refine} differs from the table path")
+
+    def run():
+        kbsim.SIGNAL_MAP_CACHE.clear()
+        return kbsim.calc_signal_map(*args)
+
+    return run
+
+
+def _check_signal(length):
+    # a clear ray is walked all the way, the worst case
+    mask = np.ones((2 * length + 1, 2 * length + 1), "bool")
+    ob_map = np.zeros((700, 1000), "bool")
+    bts, ue = (100, 100), (100 + length, 100 + length * 2 // 3)
+    return lambda: kbsim.check_signal(mask, ob_map, bts, ue)
+
+
+def _pair_line_of_sight(pairs, obstacles):
+    sc = synthetic_scenario(pairs, pairs, obstacles)
+    ob_map = sc.obstacle_map()
+    bts = np.array([(b.x, b.y) for b in sc.base_stations])
+    ues = np.array([(u.x, u.y) for u in sc.user_equipment])
+    return lambda: kbsim.pair_line_of_sight(bts, ues, ob_map)
+
+
+def _add_to_map(obstacles, size):
+    obs = [replace(o, size=size) for o in synthetic_scenario(0, 0, obstacles).obstacles]
+
+    def run():
+        ob_map = np.zeros((700, 1000), "bool")
+        for o in obs:
+            o.add_to_map(ob_map)
+        return ob_map
+
+    return run
+
+
+def _raster_update(obstacles, size):
+    # moving one obstacle of many, as dragging it in the GUI does
+    raster = kbsim.ObstacleRaster(1000, 700)
+    for i, o in enumerate(synthetic_scenario(0, 0, obstacles).obstacles):
+        raster.update(i, o.x, o.y, size, o.attenuation, o.height)
+    step = itertools.cycle((0, 1))
+    return lambda: raster.update(0, 500 + next(step), 350, size, 12.0)
+
+
+def _pattern_from_msi_file(points):
+    text = synthetic_msi(points)
+    return lambda: pattern_from_msi_file(io.StringIO(text))
+
+
+def _generate_mesh(step):
+    angles = np.arange(-180, 181, step)
+
+    def run():
+        structured_mesh.cache_clear()
+        return generate_mesh(angles)
+
+    return run
+
+
+def _simulate(bts, ues, obstacles, mode, masks):
+    sc = synthetic_scenario(bts, ues, obstacles)
+    # like `run_sim`, obstacles come already rasterized from the GUI and the
+    # default "penetration" mode is its method
+    sc.obstacle_mask = sc.obstacle_map()
+    sc.obstacle_loss = sc.loss_maps()
+    sc.penetration = mode in ("penetration", "diffraction")
+    sc.diffraction = mode == "diffraction"
+    for b in sc.base_stations:
+        b.coverage(sc.grid)
+
+    def run():
+        if masks == "cold":
+            kbsim.SIGNAL_MAP_CACHE.clear()
+        stations = [
+            replace(b, signal_map=None, reachable_map=None) for b in sc.base_stations
+        ]
+        return kbsim.simulate(
+            replace(sc, base_stations=stations), shadow_maps=mode != "rays"
+        )
+
+    return run
+
+
+CASES: list[Case] = [
+    *_sweep(
+        "calc_signal_map",
+        _calc_signal_map,
+        dict(
+            extent="1000x700",
+            pattern="dipole",
+            angle_step=1.0,
+            refine=1,
+            model="free space",
+        ),
+        slow=dict(extent={"2000x1400"}, angle_step={0.25}),
+        extent=("250x175", "500x350", "1000x700", "2000x1400"),
+        pattern=tuple(PATTERNS),
+        angle_step=(1.0, 0.5, 0.25),
+        refine=(1, 4, 16),
+        model=tuple(kbsim.MODELS),
+    ),
+    *_sweep("check_signal", _check_signal, dict(length=100), length=(10, 100, 500)),
+    *_sweep(
+        "pair_line_of_sight",
+        _pair_line_of_sight,
+        dict(pairs=100, obstacles=100),
+        slow=dict(pairs={10000}),
+        pairs=(10, 100, 1000, 10000),
+        obstacles=(0, 100, 1000),
+    ),
+    *_sweep(
+        "Obstacle.add_to_map",
+        _add_to_map,
+        dict(obstacles=100, size=4),
+        obstacles=(10, 100, 1000),
+        size=(4, 16, 64),
+    ),
+    *_sweep(
+        "ObstacleRaster.update",
+        _raster_update,
+        dict(obstacles=100, size=4),
+        obstacles=(10, 100, 1000),
+        size=(4, 16, 64),
+    ),
+    *_sweep(
+        "pattern_from_msi_file",
+        _pattern_from_msi_file,
+        dict(points=360),
+        points=(90, 360, 720, 3600),
+    ),
+    *_sweep("generate_mesh", _generate_mesh, dict(step=2), step=(1, 2, 5, 10)),
+    *_sweep(
+        "simulate",
+        _simulate,
+        dict(bts=5, ues=20, obstacles=100, mode="penetration", masks="cached"),
+        slow=dict(bts={50}, ues={1000}, mode={"diffraction"}, masks={"cold"}),
+        bts=(1, 5, 20, 50),
+        ues=(2, 20, 100, 1000),
+        obstacles=(0, 100, 1000),
+        mode=("penetration", "shadow", "rays", "diffraction"),
+        masks=("cached", "cold"),
+    ),
+]
+"""All benchmark cases, the parameters of a case are part of its ID"""
@@ -0,0 +1,284 @@
+"""Headless runner of the benchmark cases and the regression report"""
+
+from collections.abc import Sequence
+from typing import NamedTuple, Optional
+import argparse
+import json
+import os
+import pathlib as pl
+import platform
+import statistics
+import sys
+import timeit
+import numpy as np
+from .cases import CASES, Case
+
+BASELINE = pl.Path(__file__).with_name("baseline.json")
+"""Default baseline, recorded with `--save`"""
+THRESHOLD = 0.5
+"""Default allowed slowdown, 0.5 fails cases more than 50% slower"""
+RETRIES = 2
+"""Default number of times slower cases are measured again before failing"""
+
+
+class Timing(NamedTuple):
+    seconds: float
+    """Fastest time of one call, the least noisy estimate"""
+    median: float
+    """Median time of one call over the repeats"""
+    number: int
+    """Calls per repeat"""
+
+
+def measure(fn, repeat: int = 5) -> Timing:
+    """Times `fn` like `timeit`, with enough calls per repeat to take 0.2 s"""
+    fn()  # warm up lazily built tables and caches
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    times = [t / number for t in timer.repeat(repeat, number)]
+    return Timing(min(times), statistics.median(times), number)
+
+
+def _calibration_workload():
+    rng = np.random.default_rng(0)
+    np.sort(rng.random(2**18))
+    sum(i * i for i in range(100_000))
+
+
+def settle_allocator():
+    """Frees one large block so cases allocating a few MB don't page fault
+
+    glibc raises its mmap and trim thresholds after freeing a large block, so
+    without this a case run alone is slower than the same case run after
+    others, e.g. `-k generate_mesh` against a baseline of the full suite.
+    """
+    np.ones(2**22 - 2**16)  # just below the 32 MiB maximum threshold
+
+
+def calibrate(repeat: int = 5) -> float:
+    """Time of a fixed NumPy and pure Python workload, the unit of comparisons"""
+    return measure(_calibration_workload, repeat).seconds
+
+
+def machine() -> dict:
+    """Description of the machine and versions, stored with the results"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_cases(
+    cases: Sequence[Case], repeat: int = 5, progress=sys.stderr
+) -> dict[str, Timing]:
+    """Measures every case, printing progress as they finish"""
+    results = {}
+    for i, case in enumerate(cases, 1):
+        timing = measure(case.setup(**case.params), repeat)
+        results[case.id] = timing
+        print(
+            f"[{i}/{len(cases)}] {case.id}: {_format(timing.seconds)}",
+            file=progress,
+            flush=True,
+        )
+    return results
+
+
+def load_results(path: pl.Path) -> Optional[dict]:
+    """Reads results written by `save_results`, None if the file doesn't exist"""
+    path = pl.Path(path)
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text())
+    data["results"] = {k: Timing(**v) for k, v in data["results"].items()}
+    return data
+
+
+def save_results(
+    path: pl.Path,
+    results: dict[str, Timing],
+    calibration: float,
+    previous: Optional[dict] = None,
+):
+    """Writes results, keeping the cases of `previous` that weren't run again
+
+    Kept timings are rescaled to the new calibration.
+    """
+    merged = {}
+    if previous is not None:
+        scale = calibration / previous["calibration"]
+        merged = {
+            k: Timing(t.seconds * scale, t.median * scale, t.number)
+            for k, t in previous["results"].items()
+        }
+    merged.update(results)
+    data = {
+        "machine": machine(),
+        "calibration": calibration,
+        "results": {k: t._asdict() for k, t in sorted(merged.items())},
+    }
+    pl.Path(path).write_text(json.dumps(data, indent=1) + "\n")
+
+
+class Comparison(NamedTuple):
+    case: str
+    baseline: Optional[float]
+    current: float
+    ratio: Optional[float]
+    """Calibrated current / baseline time, None for new cases"""
+    status: str
+    """ok, slower (a regression), faster or new"""
+
+
+def compare(
+    results: dict[str, Timing],
+    calibration: float,
+    baseline: dict,
+    threshold: float = THRESHOLD,
+) -> list[Comparison]:
+    """Compares results against a baseline in units of the calibration workload"""
+    scale = baseline["calibration"] / calibration
+    rows = []
+    for case, timing in results.items():
+        base = baseline["results"].get(case)
+        if base is None:
+            rows.append(Comparison(case, None, timing.seconds, None, "new"))
+            continue
+        ratio = timing.seconds * scale / base.seconds
+        if ratio > 1 + threshold:
+            status = "slower"
+        elif ratio < 1 / (1 + threshold):
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append(Comparison(case, base.seconds, timing.seconds, ratio, status))
+    return rows
+
+
+def confirm(
+    rows: list[Comparison],
+    cases: Sequence[Case],
+    baseline: dict,
+    threshold: float = THRESHOLD,
+    repeat: int = 5,
+    retries: int = RETRIES,
+    progress=sys.stderr,
+) -> list[Comparison]:
+    """Measures slower cases again with a new calibration, keeping the best ratio
+
+    A busy machine slows down single cases, a real regression stays slower.
+    """
+    by_id = {c.id: c for c in cases}
+    rows = list(rows)
+    for _ in range(retries):
+        slower = [i for i, r in enumerate(rows) if r.status == "slower"]
+        if not slower:
+            break
+        print(f"Measuring {len(slower)} slower cases again", file=progress)
+        calibration = calibrate(repeat)
+        again = run_cases([by_id[rows[i].case] for i in slower], repeat, progress)
+        for i, row in zip(slower, compare(again, calibration, baseline, threshold)):
+            if row.ratio < rows[i].ratio:
+                rows[i] = row
+    return rows
+
+
+def _format(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def report(rows: Sequence[Comparison], file=sys.stdout):
+    """Prints the comparison as a table, regressions marked with `!`"""
+    width = max([len(r.case) for r in rows] + [4])
+    print(
+        f"  {'case':<{width}}  {'baseline':>10}  {'current':>10}  {'ratio':>6}  status",
+        file=file,
+    )
+    for r in rows:
+        ratio = "-" if r.ratio is None else f"{r.ratio:.2f}"
+        print(
+            f"{'!' if r.status == 'slower' else ' '} {r.case:<{width}}  "
+            f"{_format(r.baseline):>10}  {_format(r.current):>10}  {ratio:>6}  "
+            f"{r.status}",
+            file=file,
+        )
+    counts = {s: sum(r.status == s for r in rows) for s in ("slower", "faster", "new")}
+    print(
+        f"{len(rows)} cases, {counts['slower']} slower, {counts['faster']} faster, "
+        f"{counts['new']} new",
+        file=file,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Benchmarks of the hot paths"
+    )
+    parser.add_argument(
+        "-k", dest="pattern", help="only run cases whose ID contains this text"
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="skip the largest scaling cases"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="timed repeats (default: 5)"
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help=f"allowed slowdown before failing (default: {THRESHOLD})",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=RETRIES,
+        help=f"measure slower cases again this many times (default: {RETRIES})",
+    )
+    parser.add_argument(
+        "-b", "--baseline", type=pl.Path, default=BASELINE, help="baseline file"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the baseline"
+    )
+    parser.add_argument("-o", "--output", type=pl.Path, help="also write the results")
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    cases = [
+        c
+        for c in CASES
+        if (c.quick or not args.quick) and (not args.pattern or args.pattern in c.id)
+    ]
+    if args.list:
+        print("\n".join(c.id for c in cases))
+        return 0
+    if not cases:
+        parser.error("no cases selected")
+
+    settle_allocator()
+    calibration = calibrate(args.repeat)
+    results = run_cases(cases, args.repeat)
+    baseline = load_results(args.baseline)
+    if args.output:
+        save_results(args.output, results, calibration)
+    if args.save:
+        save_results(args.baseline, results, calibration, baseline)
+        print(f"Saved {len(results)} cases to {args.baseline}", file=sys.stderr)
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline}, record one with --save")
+        return 0
+    rows = compare(results, calibration, baseline, args.threshold)
+    rows = confirm(rows, cases, baseline, args.threshold, args.repeat, args.retries)
+    report(rows)
+    return int(any(r.status == "slower" for r in rows))
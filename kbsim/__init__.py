@@ -0,0 +1,47 @@
+"""Display-independent simulation engine of the KB simulator"""
+
+from .engine import (
+    FREQ,
+    RECV_SENSITIVITY,
+    RECV_HEIGHT,
+    GRID_SIZE,
+    RECV_MAGIC,
+    MATERIALS,
+    SIM_SIZE,
+    CALC_SIZE,
+    DEFAULT_GRID,
+    get_cropped_matrix,
+    SIGNAL_MAP_CACHE,
+    signal_map_key,
+    calc_signal_map,
+    check_signal,
+    coverage_lookup,
+    BaseStation,
+    UserEquipment,
+    Obstacle,
+    Scenario,
+    SimulationResult,
+    simulate,
+)
+from .los import line_of_sight, pair_line_of_sight
+from .shadow import shadow_map, reachable_map, loss_map, knife_edge_loss
+from .raster import ObstacleRaster
+from .cache import LRUCache, CacheStats, array_hash
+from .geometry import Grid
+from .multires import signal_level, coarse_to_fine
+from .tiles import TileStore, TiledCoverage
+from .parallel import ParallelBackend, calc_signal_maps
+from .servers import ServerMaps, server_maps
+from .network import Network, UnionFind
+from .spatial import SpatialIndex
+from .live import LiveSimulation
+from .propagation import (
+    PathLossModel,
+    FreeSpace,
+    LogDistance,
+    OkumuraHata,
+    Cost231,
+    FREE_SPACE,
+    MODELS,
+)
+from .scenario_file import SavedScenario, save_scenario, load_scenario
@@ -0,0 +1,125 @@
+"""Bounded caches of computed rasters shared across base stations."""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+import hashlib
+import threading
+import numpy as np
+
+
+def array_hash(arr: np.ndarray) -> str:
+    """Content hash of an array, including its shape and dtype"""
+    arr = np.ascontiguousarray(arr)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{arr.dtype.str}{arr.shape}".encode())
+    h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    return 0
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, (tuple, list)):
+        for v in value:
+            _freeze(v)
+    return value
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    nbytes: int = 0
+    entries: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache:
+    """Least-recently-used cache of arrays bounded by their total size
+
+    Stored arrays are made read-only, since every hit returns the same object.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[Hashable, object] = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    @property
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            self._stats.hits,
+            self._stats.misses,
+            self._stats.evictions,
+            self._nbytes,
+            len(self._data),
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Optional[object]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self._stats.misses += 1
+                return None
+            self._stats.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value):
+        size = _nbytes(value)
+        with self._lock:
+            if key in self._data:
+                self._nbytes -= _nbytes(self._data.pop(key))
+            if size > self.max_bytes:
+                return _freeze(value)
+            self._data[key] = _freeze(value)
+            self._nbytes += size
+            self._evict()
+        return value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], object]):
+        """Returns the cached value or stores the result of `compute()`"""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and self._data:
+            _, value = self._data.popitem(last=False)
+            self._nbytes -= _nbytes(value)
+            self._stats.evictions += 1
+
+    def resize(self, max_bytes: int):
+        """Changes the memory cap, evicting entries if needed"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._nbytes = 0
+            self._stats = CacheStats()
@@ -0,0 +1,260 @@
+"""Command-line batch runner of scenario files.
+
+    python -m kbsim run scenarios/*.json --workers 8 --out results
+
+Every scenario is loaded, simulated like the RUN button of the GUI and
+summarized into `<out>/<name>.summary.json`, with one row per scenario
+written to `<out>/summary.csv`. The suffixes keep the outputs from replacing
+scenario files or their sidecars when `--out` is the scenario directory, and
+globs skip summaries so the next run doesn't take them for scenarios.
+Scenarios run in parallel in a process pool and progress is printed to
+stderr as they finish.
+"""
+
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+import argparse
+import csv
+import glob
+import json
+import os
+import pathlib as pl
+import sys
+import time
+import traceback
+import numpy as np
+from .engine import SimulationResult, simulate
+from .scenario_file import load_scenario, save_scenario
+from .servers import server_maps
+
+SUMMARY_SUFFIX = ".summary.json"
+"""Suffix of the per-scenario summaries, never matched by globs"""
+CSV_FIELDS = (
+    "scenario",
+    "status",
+    "base_stations",
+    "user_equipment",
+    "connected_pairs",
+    "pairs",
+    "coverage",
+    "elapsed",
+    "error",
+)
+
+
+def coverage_map(result: SimulationResult) -> np.ndarray:
+    """(height, width) union of the obstacle-aware masks of all base stations
+
+    Scenarios with obstacle losses already have their masks. Otherwise rays
+    are traced per UE, and the shadowed masks of `BaseStation.reachable` are
+    calculated for the raster.
+    """
+    sc = result.scenario
+    covered = np.zeros((sc.height, sc.width), "bool")
+    for bts in sc.base_stations:
+        mask = bts.reachable_map
+        if mask is None:
+            mask = bts.reachable(result.obstacle_map, sc.grid)
+        h, w = mask.shape
+        y0, x0 = bts.y - h // 2, bts.x - w // 2
+        ys = slice(max(y0, 0), min(y0 + h, sc.height))
+        xs = slice(max(x0, 0), min(x0 + w, sc.width))
+        if ys.start < ys.stop and xs.start < xs.stop:
+            covered[ys, xs] |= mask[
+                ys.start - y0 : ys.stop - y0, xs.start - x0 : xs.stop - x0
+            ]
+    return covered
+
+
+def summarize(result: SimulationResult) -> dict:
+    """Machine-readable connections, routes and coverage of a result"""
+    sc = result.scenario
+    network = result.network()
+    ues = network.ue_names
+    connected = network.connectivity()
+    routes = [
+        {"from": a, "to": b, "path": network.route(a, b)}
+        for k, a in enumerate(ues)
+        for b in ues[k + 1 :]
+    ]
+    return {
+        "base_stations": len(sc.base_stations),
+        "user_equipment": len(ues),
+        "connections": {ue: result.connections(ue) for ue in ues},
+        "connected_pairs": int(np.count_nonzero(np.triu(connected, 1))),
+        "pairs": len(ues) * (len(ues) - 1) // 2,
+        "routes": routes,
+        "coverage": float(coverage_map(result).mean()) if sc.width * sc.height else 0.0,
+    }
+
+
+def run_scenario(
+    path: str,
+    out_dir: str,
+    name: Optional[str] = None,
+    rasters: bool = False,
+    update_cache: bool = False,
+) -> dict:
+    """Simulates one scenario file and writes its summary
+
+    Args:
+        path (str): scenario file, see `scenario_file`
+        out_dir (str): directory of the outputs
+        name (str, optional): file name of the outputs. Defaults to the stem
+        of `path`.
+        rasters (bool, optional): also write `<name>.rasters.npz` with the
+        coverage, best-server, RSRP and SINR maps, all with obstacles. Defaults
+        to False.
+        update_cache (bool, optional): store the computed coverage masks in the
+        sidecar of the scenario. Defaults to False.
+
+    Returns:
+        dict: summary, "status" is "ok" or "error"
+    """
+    start = time.perf_counter()
+    name = name or pl.Path(path).stem
+    summary = {"scenario": str(path), "status": "ok"}
+    try:
+        saved = load_scenario(path)
+        sc = saved.scenario
+        result = simulate(sc)
+        summary.update(summarize(result))
+        if rasters:
+            maps = server_maps(
+                sc.base_stations,
+                sc.width,
+                sc.height,
+                sc.grid,
+                masks=[b.reachable_map for b in sc.base_stations],
+            )
+            np.savez_compressed(
+                pl.Path(out_dir) / f"{name}.rasters.npz",
+                coverage=coverage_map(result),
+                server=maps.server,
+                rsrp=maps.rsrp,
+                sinr=maps.sinr,
+            )
+        if update_cache:
+            save_scenario(path, sc, saved.pattern_names)
+    except Exception as e:  # reported per scenario, the batch goes on
+        summary.update(
+            status="error",
+            error=f"{type(e).__name__}: {e}",
+            traceback=traceback.format_exc(),
+        )
+    summary["elapsed"] = time.perf_counter() - start
+    with open(pl.Path(out_dir) / f"{name}{SUMMARY_SUFFIX}", "w") as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+def expand(patterns: Sequence[str]) -> list[str]:
+    """Expands glob patterns the shell didn't, keeping the order and dropping repeats
+
+    Summaries of earlier runs are skipped in glob matches, named files are kept.
+    """
+    paths: dict[str, None] = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            matches = [
+                p for p in sorted(glob.glob(pattern)) if not p.endswith(SUMMARY_SUFFIX)
+            ]
+        else:
+            matches = [pattern]
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+def run(
+    paths: Sequence[str],
+    out_dir: str,
+    workers: Optional[int] = None,
+    rasters: bool = False,
+    update_cache: bool = False,
+    progress=sys.stderr,
+) -> list[dict]:
+    """Runs scenario files in a process pool
+
+    Returns:
+        list[dict]: summaries in the order of `paths`
+    """
+    pl.Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    summaries: dict[str, dict] = {}
+    start = time.perf_counter()
+    # scenarios of the same name in different directories get numbered outputs
+    stems = [pl.Path(p).stem for p in paths]
+    names = [s if stems.count(s) == 1 else f"{s}-{i}" for i, s in enumerate(stems)]
+
+    def report(summary: dict):
+        summaries[summary["scenario"]] = summary
+        status = summary["status"]
+        if status == "ok":
+            detail = (
+                f"{summary['connected_pairs']}/{summary['pairs']} pairs connected, "
+                f"{summary['coverage']:.1%} covered"
+            )
+        else:
+            detail = summary["error"]
+        print(
+            f"[{len(summaries)}/{len(paths)}] {summary['scenario']}: {status} "
+            f"in {summary['elapsed']:.2f} s, {detail}",
+            file=progress,
+            flush=True,
+        )
+
+    if workers == 1:
+        for path, name in zip(paths, names):
+            report(run_scenario(path, out_dir, name, rasters, update_cache))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = [
+                pool.submit(run_scenario, path, out_dir, name, rasters, update_cache)
+                for path, name in zip(paths, names)
+            ]
+            for future in as_completed(futures):
+                report(future.result())
+
+    ordered = [summaries[str(p)] for p in paths]
+    with open(pl.Path(out_dir) / "summary.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(ordered)
+    failed = sum(s["status"] != "ok" for s in ordered)
+    print(
+        f"Finished {len(paths)} scenarios in {time.perf_counter() - start:.1f} s, "
+        f"{failed} failed",
+        file=progress,
+    )
+    return ordered
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m kbsim")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="simulate scenario files")
+    run_parser.add_argument("scenarios", nargs="+", help="scenario files or globs")
+    run_parser.add_argument(
+        "-w", "--workers", type=int, help="parallel processes, defaults to CPU count"
+    )
+    run_parser.add_argument(
+        "-o", "--out", default="results", help="output directory (default: results)"
+    )
+    run_parser.add_argument(
+        "--rasters",
+        action="store_true",
+        help="write coverage, best-server, RSRP and SINR maps",
+    )
+    run_parser.add_argument(
+        "--update-cache",
+        action="store_true",
+        help="store computed coverage masks in the scenario sidecars",
+    )
+    args = parser.parse_args(argv)
+
+    paths = expand(args.scenarios)
+    if not paths:
+        parser.error("no scenario files found")
+    summaries = run(paths, args.out, args.workers, args.rasters, args.update_cache)
+    return int(any(s["status"] != "ok" for s in summaries))
@@ -0,0 +1,582 @@
+"""Headless simulation engine.
+
+All propagation and connectivity logic lives here and depends on NumPy only,
+so scenarios can be evaluated without a display. The Tkinter GUI in `main.py`
+is a thin client that converts its canvas objects into the data objects below.
+
+Rasters follow the image convention: shape (height, width), indexed [y, x].
+"""
+
+from dataclasses import dataclass, field
+from typing import Optional
+import numpy as np
+from patterns import (
+    HALF_WAVE_DIPOLE,
+    interpolate_row,
+    interpolated_gain,
+    is_separable,
+)
+from .los import pair_line_of_sight
+from . import shadow
+from .raster import OBSTACLE_HEIGHT, ObstacleRaster, stamp_window
+from .cache import LRUCache, array_hash
+from . import geometry, multires
+from .geometry import Grid
+from .network import Network
+from .propagation import FREE_SPACE, PathLossModel
+
+FREQ = 900  # MHz
+RECV_SENSITIVITY = -90  # dBm
+RECV_HEIGHT = 1.5  # m
+GRID_SIZE = 1  # km
+
+# Friis equation:
+# P_r = P_t + G_t + G_r + L_f
+# assume isotropic receiver antenna
+# P_r = P_t + G_t - 32.5 - 20 * log10(f) - 20 * log10(d)
+# we can use distance squared to ommit square root
+# P_r = P_t + G_t - 32.5 - 20 * log10(f) - 10 * log10(d**2)
+# UE has signal if P_r > RECV_SENSITIVITY:
+# P_t + G_t - 10 * log10(d**2) > RECV_SENSITIVITY + 32.5 + 20 * log10(f)
+# P_t + G_t - 10 * log10(d**2) > RECV_MAGIC
+# other models and per-BTS radio parameters follow the same split into a
+# distance table and a threshold, see `propagation`
+
+RECV_MAGIC = RECV_SENSITIVITY + 32.5 + 20 * np.log10(FREQ)
+
+MATERIALS = {
+    "opaque": np.inf,
+    "concrete": 25.0,
+    "brick": 12.0,
+    "wood": 6.0,
+    "glass": 3.0,
+    "foliage": 2.0,
+}
+"""Penetration loss of obstacle materials in dB"""
+
+SIM_SIZE = (1000, 700)
+CALC_SIZE = float(max(SIM_SIZE) // 2)
+# distance and azimuth tables are built on first use, see `geometry`
+DEFAULT_GRID = Grid(GRID_SIZE, SIM_SIZE)
+
+
+def get_cropped_matrix(mat: np.ndarray) -> np.ndarray:
+    """Crops a mask to the smallest window that is symmetric around its center
+
+    Args:
+        mat (np.ndarray): boolean mask centered on the base station
+
+    Returns:
+        np.ndarray: cropped mask with odd dimensions, or a 3x3 empty mask
+    """
+    idx = np.where(mat)
+    if not idx[0].size:
+        return np.zeros((3, 3), "bool")
+    p = np.array(mat.shape) // 2
+    mx, my = (max(abs(p[i] - idx[i].min()), abs(idx[i].max() - p[i])) for i in range(2))
+    return mat[p[0] - mx : p[0] + mx + 1, p[1] - my : p[1] + my + 1]
+
+
+SIGNAL_MAP_CACHE = LRUCache(64 * 2**20)
+"""Coverage masks shared by all base stations, keyed by `signal_map_key`"""
+
+
+def signal_map_key(
+    power: float,
+    height: float,
+    angle: int,
+    tilt: int,
+    pattern: np.ndarray,
+    grid: Grid = DEFAULT_GRID,
+    model: PathLossModel = FREE_SPACE,
+    frequency: float = FREQ,
+    sensitivity: float = RECV_SENSITIVITY,
+) -> tuple:
+    """Cache key of the coverage mask, angles are reduced modulo 360"""
+    return (
+        float(power),
+        float(height),
+        int(angle) % 360,
+        int(tilt) % 360,
+        array_hash(pattern),
+        grid,
+        model,
+        float(frequency),
+        float(sensitivity),
+    )
+
+
+def calc_signal_map(
+    power: float,
+    height: float,
+    angle: int,
+    tilt: int,
+    pattern: np.ndarray,
+    grid: Grid = DEFAULT_GRID,
+    model: PathLossModel = FREE_SPACE,
+    frequency: float = FREQ,
+    sensitivity: float = RECV_SENSITIVITY,
+) -> np.ndarray:
+    """Calculates the coverage mask of a base station
+
+    Results are memoized in `SIGNAL_MAP_CACHE` and returned read-only.
+
+    Args:
+        power (float): transmit power in dBm
+        height (float): antenna height in meters
+        angle (int): azimuth of the main lobe in degrees
+        tilt (int): antenna tilt in degrees
+        pattern (np.ndarray): (2,360) or full-sphere (360,360) radiation pattern,
+        see `patterns.sphere_pattern`
+        grid (Grid, optional): calculation grid. Defaults to `DEFAULT_GRID`.
+        model (PathLossModel, optional): propagation model. Defaults to free space.
+        frequency (float, optional): carrier frequency in MHz. Defaults to `FREQ`.
+        sensitivity (float, optional): receiver sensitivity in dBm. Defaults to
+        `RECV_SENSITIVITY`.
+
+    Returns:
+        np.ndarray: boolean mask centered on the base station, see `get_cropped_matrix`
+    """
+    args = (power, height, angle, tilt, pattern, grid, model, frequency, sensitivity)
+    return SIGNAL_MAP_CACHE.get_or_compute(
+        signal_map_key(*args), lambda: _calc_signal_map(*args)
+    )
+
+
+def _calc_signal_map(
+    power: float,
+    height: float,
+    angle: int,
+    tilt: int,
+    pattern: np.ndarray,
+    grid: Grid,
+    model: PathLossModel = FREE_SPACE,
+    frequency: float = FREQ,
+    sensitivity: float = RECV_SENSITIVITY,
+) -> np.ndarray:
+    half, dh = grid.half, height - RECV_HEIGHT
+    threshold = model.threshold(sensitivity, frequency, height, dh)
+    if grid.refine > 1:
+
+        def evaluate(dy, dx):
+            level = multires.signal_level(
+                dy,
+                dx,
+                power,
+                dh,
+                angle,
+                tilt,
+                pattern,
+                grid.cell_size,
+                grid.angle_step,
+                model,
+                frequency,
+                height,
+            )
+            return level - threshold
+
+        r = multires.reach(
+            power,
+            pattern,
+            threshold,
+            half,
+            grid.cell_size,
+            model,
+            frequency,
+            height,
+            dh,
+        )
+        mask = multires.coarse_to_fine(evaluate, half, grid.refine, grid.margin, r)
+        return get_cropped_matrix(mask).copy()
+
+    rows, cols = geometry.mirror_index(half)
+    tables = geometry.height_tables(half, grid.cell_size, dh)
+    loss = model.quadrant(half, grid.cell_size, frequency, height, dh)
+    # distance-only terms are shared by all BTS at this height and mirrored
+    tmp = (power - loss)[rows, cols]
+    if grid.angle_step < 1:
+        tmp += _interpolated_gain(pattern, angle, tilt, grid, dh)
+        return get_cropped_matrix(tmp > threshold).copy()
+    azimuth = (geometry.azimuth(half) + angle) % 360
+    elevation = (tables.elevation + tilt) % 360
+    if is_separable(pattern):
+        tmp += pattern[0, azimuth] + pattern[1, elevation][rows, cols]
+    else:  # full-sphere pattern, a single 2D gather
+        tmp += pattern[elevation[rows, cols], azimuth]
+    # copy so the cached crop doesn't keep the full-size array alive
+    return get_cropped_matrix(tmp > threshold).copy()
+
+
+def _interpolated_gain(
+    pattern: np.ndarray, angle: int, tilt: int, grid: Grid, dh: float
+) -> np.ndarray:
+    """Full-grid antenna gain interpolated with the shared fraction tables"""
+    half = grid.half
+    rows, cols = geometry.mirror_index(half)
+    az = geometry.azimuth_fraction(half, grid.angle_step)
+    el = geometry.elevation_fraction(half, grid.cell_size, dh, grid.angle_step)
+    az_index, el_index = (az.index + angle) % 360, (el.index + tilt) % 360
+    if is_separable(pattern):
+        # elevation only depends on the distance, interpolate the quadrant
+        el_gain = interpolate_row(pattern[1], el_index, el.weight)
+        return interpolate_row(pattern[0], az_index, az.weight) + el_gain[rows, cols]
+    return interpolated_gain(
+        pattern, az_index, az.weight, el_index[rows, cols], el.weight[rows, cols]
+    )
+
+
+def check_signal(
+    signal_map: np.ndarray,
+    obstacle_map: np.ndarray,
+    bts: tuple[int, int],
+    ue: tuple[int, int],
+) -> bool:
+    """Checks wheter the UEs' signal is good enough for transmission
+
+    The ray is walked one pixel at a time along its major axis, from the base
+    station (inclusive) to the UE (exclusive).
+
+    Args:
+        signal_map (np.ndarray): coverage mask of the base station
+        obstacle_map (np.ndarray): mask with ones set where obstacles are present
+        bts (tuple[int, int]): base station position (x, y)
+        ue (tuple[int, int]): user device position (x, y)
+    Returns:
+        bool: True if UE has signal from the base station
+    """
+    d = [ue[0] - bts[0], ue[1] - bts[1]]
+    s = signal_map.shape
+    if (
+        abs(d[0]) > s[1] / 2
+        or abs(d[1]) > s[0] / 2
+        or (not signal_map[(d[1] + s[0] // 2) % s[0], (d[0] + s[1] // 2) % s[1]])
+    ):
+        return False
+
+    if abs(d[1]) > abs(d[0]):  # more range over y
+        a = d[0] / d[1]
+        for y in range(bts[1], ue[1], -1 if bts[1] > ue[1] else 1):
+            if obstacle_map[y, round(bts[0] + (y - bts[1]) * a)]:
+                return False
+    else:
+        a = d[1] / d[0] if d[0] else 0.0
+        for x in range(bts[0], ue[0], -1 if bts[0] > ue[0] else 1):
+            if obstacle_map[round(bts[1] + a * (x - bts[0])), x]:
+                return False
+    return True
+
+
+def coverage_lookup(
+    signal_map: np.ndarray, bts: tuple[int, int], ue: np.ndarray
+) -> np.ndarray:
+    """Vectorized free-space part of `check_signal`
+
+    Args:
+        signal_map (np.ndarray): coverage mask of the base station
+        bts (tuple[int, int]): base station position (x, y)
+        ue (np.ndarray): (N,2) user device positions (x, y)
+
+    Returns:
+        np.ndarray: (N,) boolean vector, True where the UE is inside the coverage
+    """
+    d = np.asarray(ue, dtype=np.int64).reshape(-1, 2) - bts
+    s = signal_map.shape
+    inside = (np.abs(d[:, 0]) <= s[1] / 2) & (np.abs(d[:, 1]) <= s[0] / 2)
+    covered = np.zeros(len(d), "bool")
+    d = d[inside]
+    covered[inside] = signal_map[
+        (d[:, 1] + s[0] // 2) % s[0], (d[:, 0] + s[1] // 2) % s[1]
+    ]
+    return covered
+
+
+@dataclass
+class UserEquipment:
+    name: str
+    x: int
+    y: int
+
+
+@dataclass
+class Obstacle:
+    name: str
+    x: int
+    y: int
+    size: int = 4
+    material: str = "opaque"
+    """Key of `MATERIALS`"""
+    height: float = OBSTACLE_HEIGHT  # m
+
+    @property
+    def attenuation(self) -> float:
+        """Penetration loss in dB"""
+        return MATERIALS[self.material]
+
+    def add_to_map(self, ob_map: np.ndarray):
+        """Marks the disc covered by the obstacle in `ob_map`"""
+        window, stamp = stamp_window(ob_map.shape, self.x, self.y, self.size)
+        ob_map[window][stamp] = 1
+
+
+@dataclass
+class BaseStation:
+    name: str
+    x: int
+    y: int
+    power: float = 30.0  # dBm
+    height: float = 20.0  # m
+    angle: int = 0
+    tilt: int = 0
+    frequency: float = FREQ  # MHz
+    sensitivity: float = RECV_SENSITIVITY  # dBm
+    model: PathLossModel = FREE_SPACE
+    pattern: np.ndarray = field(
+        default_factory=lambda: HALF_WAVE_DIPOLE, repr=False, compare=False
+    )
+    signal_map: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    """Precomputed coverage mask, calculated on first use if not given"""
+    reachable_map: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    """Coverage mask with obstacle shadows or losses, see `reachable`, `attenuated`"""
+
+    @property
+    def threshold(self) -> float:
+        """Signal level a covered cell has to exceed, see `propagation`"""
+        return self.model.threshold(
+            self.sensitivity, self.frequency, self.height, self.height - RECV_HEIGHT
+        )
+
+    def coverage(self, grid: Grid = DEFAULT_GRID) -> np.ndarray:
+        """Returns the coverage mask, calculating it on `grid` if needed"""
+        if self.signal_map is None:
+            self.signal_map = calc_signal_map(
+                self.power,
+                self.height,
+                self.angle,
+                self.tilt,
+                self.pattern,
+                grid,
+                self.model,
+                self.frequency,
+                self.sensitivity,
+            )
+        return self.signal_map
+
+    def reachable(
+        self, obstacle_map: np.ndarray, grid: Grid = DEFAULT_GRID
+    ) -> np.ndarray:
+        """Returns the coverage mask with obstacle shadows, calculating it if needed"""
+        if self.reachable_map is None:
+            self.reachable_map = shadow.reachable_map(
+                self.coverage(grid), obstacle_map, (self.x, self.y)
+            )
+        return self.reachable_map
+
+    def margin(self, grid: Grid = DEFAULT_GRID) -> np.ndarray:
+        """Signal level above the threshold over the window of the coverage mask
+
+        Only depends on the radio parameters, so it is cached in
+        `SIGNAL_MAP_CACHE` next to the mask and returned read-only as float32.
+        """
+        shape = self.coverage(grid).shape
+
+        def compute() -> np.ndarray:
+            dy = np.arange(shape[0])[:, None] - shape[0] // 2
+            dx = np.arange(shape[1])[None, :] - shape[1] // 2
+            level = multires.signal_level(
+                dy,
+                dx,
+                self.power,
+                self.height - RECV_HEIGHT,
+                self.angle,
+                self.tilt,
+                self.pattern,
+                grid.cell_size,
+                grid.angle_step,
+                self.model,
+                self.frequency,
+                self.height,
+            )
+            return (level - self.threshold).astype(np.float32)
+
+        key = signal_map_key(
+            self.power,
+            self.height,
+            self.angle,
+            self.tilt,
+            self.pattern,
+            grid,
+            self.model,
+            self.frequency,
+            self.sensitivity,
+        )
+        return SIGNAL_MAP_CACHE.get_or_compute(("margin", *key), compute)
+
+    def attenuated(
+        self,
+        attenuation: np.ndarray,
+        heights: Optional[np.ndarray] = None,
+        grid: Grid = DEFAULT_GRID,
+    ) -> np.ndarray:
+        """Returns the coverage mask after obstacle losses, calculating it if needed
+
+        Args:
+            attenuation (np.ndarray), heights (np.ndarray, optional): obstacle
+            rasters, see `Scenario.loss_maps` and `shadow.loss_map`
+        """
+        if self.reachable_map is None:
+            coverage = self.coverage(grid)
+            if not coverage.any():
+                self.reachable_map = coverage
+            else:
+                loss = shadow.loss_map(
+                    attenuation,
+                    (self.x, self.y),
+                    coverage.shape,
+                    heights,
+                    self.height,
+                    RECV_HEIGHT,
+                    grid.cell_size,
+                    self.frequency,
+                )
+                self.reachable_map = coverage & (self.margin(grid) > loss)
+        return self.reachable_map
+
+    def check_signal(
+        self, obstacle_map: np.ndarray, ue: UserEquipment, grid: Grid = DEFAULT_GRID
+    ) -> bool:
+        return check_signal(
+            self.coverage(grid), obstacle_map, (self.x, self.y), (ue.x, ue.y)
+        )
+
+
+@dataclass
+class Scenario:
+    width: int
+    height: int
+    base_stations: list[BaseStation] = field(default_factory=list)
+    user_equipment: list[UserEquipment] = field(default_factory=list)
+    obstacles: list[Obstacle] = field(default_factory=list)
+    obstacle_mask: Optional[np.ndarray] = field(default=None, repr=False)
+    """Already rasterized obstacles, e.g. `ObstacleRaster.mask`"""
+    grid: Grid = DEFAULT_GRID
+    backhaul: Optional[list[tuple[str, str]]] = None
+    """Links between base stations by name, None links every pair"""
+    penetration: bool = False
+    """Obstacles attenuate by material instead of blocking, see `loss_maps`"""
+    diffraction: bool = False
+    """Signals may also bend over obstacles, implies `penetration`"""
+    obstacle_loss: Optional[tuple[np.ndarray, np.ndarray]] = field(
+        default=None, repr=False
+    )
+    """Already rasterized (attenuation, heights), e.g. of an `ObstacleRaster`"""
+
+    def obstacle_map(self) -> np.ndarray:
+        """Rasterizes all obstacles into a (height, width) boolean mask"""
+        if self.obstacle_mask is not None:
+            return self.obstacle_mask
+        ob_map = np.zeros((self.height, self.width), "bool")
+        for obstacle in self.obstacles:
+            obstacle.add_to_map(ob_map)
+        return ob_map
+
+    def loss_maps(self) -> tuple[np.ndarray, np.ndarray]:
+        """Rasterizes obstacle attenuation (dB) and heights (m) into float32 maps"""
+        if self.obstacle_loss is not None:
+            return self.obstacle_loss
+        raster = ObstacleRaster(self.width, self.height)
+        for i, o in enumerate(self.obstacles):
+            raster.update(i, o.x, o.y, o.size, o.attenuation, o.height)
+        return raster.attenuation, raster.heights
+
+
+@dataclass
+class SimulationResult:
+    scenario: Scenario
+    reachable: np.ndarray
+    """(n_bts, n_ue) boolean matrix, True where the UE has signal from the BTS"""
+    obstacle_map: Optional[np.ndarray] = field(default=None, repr=False)
+    _networks: dict = field(default_factory=dict, init=False, repr=False)
+
+    def network(self, metric: str = "hops") -> Network:
+        """Connectivity graph of the result, see `network.Network`"""
+        if metric not in self._networks:
+            sc = self.scenario
+            self._networks[metric] = Network(
+                [b.name for b in sc.base_stations],
+                [(b.x, b.y) for b in sc.base_stations],
+                [u.name for u in sc.user_equipment],
+                [(u.x, u.y) for u in sc.user_equipment],
+                self.reachable,
+                sc.backhaul,
+                metric,
+                sc.grid.cell_size,
+            )
+        return self._networks[metric]
+
+    def connectivity(self) -> np.ndarray:
+        """(n_ue, n_ue) boolean matrix, True where two UEs can reach each other"""
+        return self.network().connectivity()
+
+    def connections(self, ue: str) -> list[str]:
+        """Names of the base stations the UE can connect to"""
+        names = [u.name for u in self.scenario.user_equipment]
+        col = self.reachable[:, names.index(ue)]
+        return [b.name for b, ok in zip(self.scenario.base_stations, col) if ok]
+
+    def route(self, ue1: str, ue2: str, metric: str = "hops") -> Optional[list[str]]:
+        """Finds the cheapest route between two UEs over the backhaul
+
+        Returns:
+            list[str] | None: [ue1, bts, ..., ue2] or None if there is no route
+        """
+        return self.network(metric).route(ue1, ue2)
+
+
+def simulate(
+    scenario: Scenario, shadow_maps: bool = False, workers: int = 1
+) -> SimulationResult:
+    """Checks which UEs of the scenario are reachable from which base stations
+
+    Args:
+        scenario (Scenario): objects placed in the simulation area
+        shadow_maps (bool, optional): look UEs up in the shadowed coverage
+        rasters instead of tracing every ray. Faster for many UEs, but shadow
+        edges are approximate. Defaults to False. Scenarios with
+        `penetration` or `diffraction` always use rasters, see
+        `BaseStation.attenuated`.
+        workers (int, optional): processes calculating missing coverage masks,
+        see `parallel.ParallelBackend`. Defaults to 1.
+
+    Returns:
+        SimulationResult: reachability of every BTS/UE pair
+    """
+    missing = [b for b in scenario.base_stations if b.signal_map is None]
+    if workers > 1 and len(missing) > 1:
+        from .parallel import calc_signal_maps
+
+        maps = calc_signal_maps(missing, scenario.grid, workers)
+        for bts, signal_map in zip(missing, maps):
+            bts.signal_map = signal_map
+
+    ob_map = scenario.obstacle_map()
+    bts_xy = np.array([(b.x, b.y) for b in scenario.base_stations]).reshape(-1, 2)
+    ue_xy = np.array([(u.x, u.y) for u in scenario.user_equipment]).reshape(-1, 2)
+    reachable = np.zeros((len(bts_xy), len(ue_xy)), "bool")
+    losses = scenario.penetration or scenario.diffraction
+    if losses:
+        attenuation, heights = scenario.loss_maps()
+        if not scenario.diffraction:
+            heights = None
+    for i, bts in enumerate(scenario.base_stations):
+        if losses:
+            mask = bts.attenuated(attenuation, heights, scenario.grid)
+        elif shadow_maps:
+            mask = bts.reachable(ob_map, scenario.grid)
+        else:
+            mask = bts.coverage(scenario.grid)
+        reachable[i] = coverage_lookup(mask, (bts.x, bts.y), ue_xy)
+    if not (shadow_maps or losses):
+        # rays are only traced for pairs inside the free-space coverage
+        i, j = np.nonzero(reachable)
+        reachable[i, j] = pair_line_of_sight(bts_xy[i], ue_xy[j], ob_map)
+    return SimulationResult(scenario, reachable, ob_map)
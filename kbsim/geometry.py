@@ -0,0 +1,218 @@
+"""Lazily built geometry lookup tables of the calculation grid.
+
+The grid spans offsets -half..half-1 in both directions around a base station.
+Distance only depends on |dx| and |dy|, so it is stored for one quadrant
+(offsets 0..half) and mirrored into the full grid with `mirror_index`.
+Azimuth is mirrored with exact integer arithmetic, giving the same truncated
+degrees as `np.rad2deg(np.arctan2(X, Y)).astype(int)` over the full grid.
+"""
+
+from dataclasses import dataclass
+from functools import cache
+from typing import NamedTuple
+import numpy as np
+from .cache import LRUCache
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Resolution and extent of the calculation grid"""
+
+    cell_size: float = 1.0
+    """Size of one grid cell (one canvas pixel) in km"""
+    extent: tuple[int, int] = (1000, 700)
+    """Size of the simulation area in cells"""
+    refine: int = 1
+    """Block size of the coarse-to-fine evaluation, 1 evaluates every cell"""
+    margin: float = 3.0
+    """Coarse samples closer than this to the threshold (dB) are refined"""
+    angle_step: float = 1.0
+    """Resolution of pattern lookups in degrees, below 1 interpolates the pattern"""
+
+    def __post_init__(self):
+        if not 0 < self.angle_step <= 1:
+            raise ValueError(f"angle_step must be in (0, 1], got {self.angle_step}")
+
+    @property
+    def half(self) -> int:
+        """Half size of the window calculated around a base station"""
+        return max(self.extent) // 2
+
+
+class Quadrant(NamedTuple):
+    distance: np.ndarray
+    """float32 squared distance in pixels, exact for half < 2896"""
+    distance_sqrt: np.ndarray
+    """float64 distance in pixels"""
+    azimuth: np.ndarray
+    """int16 azimuth in degrees, truncated toward zero"""
+    azimuth_exact: np.ndarray
+    """bool, True where the azimuth is a whole number of degrees"""
+
+
+def _readonly(*arrays: np.ndarray):
+    for arr in arrays:
+        arr.flags.writeable = False
+
+
+_QUADRANTS: dict[int, Quadrant] = {}
+_AZIMUTHS: dict[int, np.ndarray] = {}
+
+
+def install(half: int, tables: Quadrant, full_azimuth: np.ndarray):
+    """Uses externally allocated tables, e.g. in shared memory, for `half`"""
+    _readonly(*tables, full_azimuth)
+    _QUADRANTS[half] = tables
+    _AZIMUTHS[half] = full_azimuth
+
+
+def quadrant(half: int) -> Quadrant:
+    """Geometry of the offsets 0..half along both axes, indexed [|dy|, |dx|]"""
+    if half not in _QUADRANTS:
+        _QUADRANTS[half] = _quadrant(half)
+    return _QUADRANTS[half]
+
+
+def _quadrant(half: int) -> Quadrant:
+    q = np.arange(half + 1, dtype=np.float64)
+    qy, qx = q[:, None], q[None, :]
+    distance = qy**2 + qx**2
+    degrees = np.rad2deg(np.arctan2(qy, qx))
+    azimuth = np.trunc(degrees)
+    tables = Quadrant(
+        distance.astype(np.float32),
+        np.sqrt(distance),
+        azimuth.astype(np.int16),
+        degrees == azimuth,
+    )
+    _readonly(*tables)
+    return tables
+
+
+@cache
+def mirror_index(half: int) -> tuple[np.ndarray, np.ndarray]:
+    """Quadrant indexes of the full grid
+
+    Returns:
+        (rows, cols): (2*half,1) and (1,2*half) arrays, `quadrant_table[rows, cols]`
+        expands a quadrant table to the full grid
+    """
+    off = np.abs(np.arange(-half, half))
+    rows, cols = off[:, None], off[None, :]
+    _readonly(rows, cols)
+    return rows, cols
+
+
+def azimuth(half: int) -> np.ndarray:
+    """int16 azimuth of the full grid in degrees, in <-180, 180>"""
+    if half not in _AZIMUTHS:
+        _AZIMUTHS[half] = _azimuth(half)
+    return _AZIMUTHS[half]
+
+
+def _azimuth(half: int) -> np.ndarray:
+    q = quadrant(half)
+    rows, cols = mirror_index(half)
+    trunc = q.azimuth[rows, cols]
+    # arctan2(y, -x) = 180 - arctan2(y, x), truncation needs the ceiling there
+    ceil = trunc + ~q.azimuth_exact[rows, cols]
+    neg = np.arange(-half, half) < 0
+    full = np.where(neg[None, :], 180 - ceil, trunc)
+    full = np.where(neg[:, None], -full, full).astype(np.int16)
+    _readonly(full)
+    return full
+
+
+def distance(half: int) -> np.ndarray:
+    """float32 squared distance of the full grid in pixels, built on demand"""
+    rows, cols = mirror_index(half)
+    return quadrant(half).distance[rows, cols]
+
+
+def distance_sqrt(half: int) -> np.ndarray:
+    """float64 distance of the full grid in pixels, built on demand"""
+    rows, cols = mirror_index(half)
+    return quadrant(half).distance_sqrt[rows, cols]
+
+
+class AngleTables(NamedTuple):
+    index: np.ndarray
+    """int16 whole degree below the angle, within 0..359"""
+    weight: np.ndarray
+    """float32 fraction of a degree above `index`, a multiple of the angle step"""
+
+
+def angle_index(degrees: np.ndarray, step: float) -> AngleTables:
+    """Splits angles rounded to `step` into pattern indexes and weights"""
+    q = np.round(np.asarray(degrees) / step) * step
+    index = np.floor(q)
+    return AngleTables(
+        (index.astype(np.int64) % 360).astype(np.int16),
+        (q - index).astype(np.float32),
+    )
+
+
+_AZIMUTH_FRACTIONS: dict[tuple[int, float], AngleTables] = {}
+
+
+def azimuth_fraction(half: int, step: float) -> AngleTables:
+    """Interpolation tables of the full-grid azimuth, shared by all BTS"""
+    key = (half, float(step))
+    if key not in _AZIMUTH_FRACTIONS:
+        off = np.arange(-half, half, dtype=np.float64)
+        tables = angle_index(np.rad2deg(np.arctan2(off[:, None], off[None, :])), step)
+        _readonly(*tables)
+        _AZIMUTH_FRACTIONS[key] = tables
+    return _AZIMUTH_FRACTIONS[key]
+
+
+def elevation_fraction(
+    half: int, grid_size: float, dh: float, step: float
+) -> AngleTables:
+    """Interpolation tables of the elevation quadrant at a given height"""
+
+    def compute() -> AngleTables:
+        q = quadrant(half)
+        return angle_index(
+            np.rad2deg(np.arctan2(dh / 1000, q.distance_sqrt * grid_size)), step
+        )
+
+    return HEIGHT_CACHE.get_or_compute(
+        ("elevation", half, float(grid_size), float(dh), float(step)), compute
+    )
+
+
+class HeightTables(NamedTuple):
+    path_loss: np.ndarray
+    """float64 quadrant of 10 * log10(d**2 + dh**2)"""
+    elevation: np.ndarray
+    """int16 quadrant of the angle below the horizon, rounded to whole degrees"""
+
+
+HEIGHT_CACHE = LRUCache(64 * 2**20)
+"""Per-height tables shared by all base stations, see `height_tables`"""
+
+
+def height_tables(half: int, grid_size: float, dh: float) -> HeightTables:
+    """Distance-dependent tables of a base station at a given height
+
+    Args:
+        half (int): half size of the calculation grid
+        grid_size (float): size of a grid cell in km
+        dh (float): height of the antenna above the receiver in meters
+
+    Returns:
+        HeightTables: quadrant tables, expand them with `mirror_index`
+    """
+    return HEIGHT_CACHE.get_or_compute(
+        (half, float(grid_size), float(dh)),
+        lambda: _height_tables(half, grid_size, dh),
+    )
+
+
+def _height_tables(half: int, grid_size: float, dh: float) -> HeightTables:
+    q = quadrant(half)
+    path_loss = 10 * np.log10(q.distance.astype(np.float64) * grid_size**2 + dh**2)
+    # the path loss keeps the original mixed units, the angle needs km on both sides
+    elevation = np.rad2deg(np.arctan2(dh / 1000, q.distance_sqrt * grid_size))
+    return HeightTables(path_loss, np.rint(elevation).astype(np.int16))
@@ -0,0 +1,272 @@
+"""Incremental re-simulation of a scenario whose objects keep moving.
+
+Every BTS/UE pair of the reachability matrix depends on the two objects and on
+the obstacles along its ray. Edits only mark the dependent entries stale:
+moving a BTS its row (the coverage mask just translates along), moving a UE
+its column, and changing an obstacle the pairs whose ray may cross it.
+`LiveSimulation.step` then recomputes stale entries within a time budget, so
+a GUI can spread the work over frames. Scenarios with obstacle losses look
+UEs up in `BaseStation.attenuated` masks, rebuilt only for base stations that
+changed or whose stale pairs may cross a changed obstacle.
+"""
+
+from collections.abc import Hashable, Sequence
+from dataclasses import replace
+from typing import Optional
+import time
+import numpy as np
+from .engine import (
+    BaseStation,
+    Scenario,
+    SimulationResult,
+    UserEquipment,
+    coverage_lookup,
+)
+from .los import pair_line_of_sight
+from .raster import Box
+
+
+def _renumber(index: dict[Hashable, int], keys: list[Hashable], start: int):
+    """Updates the positions of the keys after `start` once one was removed"""
+    for i in range(start, len(keys)):
+        index[keys[i]] = i
+
+
+class LiveSimulation:
+    """Reachability matrix of a scenario kept up to date as objects change
+
+    Base stations and UEs are identified by arbitrary hashable keys, e.g. the
+    GUI objects they come from.
+
+    Args:
+        scenario (Scenario): initial objects, its `obstacle_mask` may be updated
+        in place by the caller, see `obstacle_changed`
+        bts_keys (Sequence[Hashable], optional): keys of the base stations.
+        Defaults to their indexes.
+        ue_keys (Sequence[Hashable], optional): keys of the UEs. Defaults to
+        their indexes.
+    """
+
+    def __init__(
+        self,
+        scenario: Scenario,
+        bts_keys: Optional[Sequence[Hashable]] = None,
+        ue_keys: Optional[Sequence[Hashable]] = None,
+    ) -> None:
+        self.scenario = replace(
+            scenario,
+            base_stations=list(scenario.base_stations),
+            user_equipment=list(scenario.user_equipment),
+            obstacle_mask=scenario.obstacle_map(),
+        )
+        self._losses = scenario.penetration or scenario.diffraction
+        if self._losses:
+            self.scenario.obstacle_loss = scenario.loss_maps()
+        self._bts_keys = list(
+            range(len(scenario.base_stations)) if bts_keys is None else bts_keys
+        )
+        self._ue_keys = list(
+            range(len(scenario.user_equipment)) if ue_keys is None else ue_keys
+        )
+        # positions of the keys, renumbered after removals
+        self._bts_index = {k: i for i, k in enumerate(self._bts_keys)}
+        self._ue_index = {k: j for j, k in enumerate(self._ue_keys)}
+        self._bts_xy = np.array(
+            [(b.x, b.y) for b in scenario.base_stations], np.int64
+        ).reshape(-1, 2)
+        self._ue_xy = np.array(
+            [(u.x, u.y) for u in scenario.user_equipment], np.int64
+        ).reshape(-1, 2)
+        shape = (len(self._bts_keys), len(self._ue_keys))
+        self.reachable = np.zeros(shape, "bool")
+        self.stale = np.ones(shape, "bool")
+        # base stations whose attenuated mask has to be rebuilt
+        self._remask = np.ones(shape[0], "bool")
+
+    @property
+    def obstacle_map(self) -> np.ndarray:
+        return self.scenario.obstacle_mask
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._bts_index or key in self._ue_index
+
+    @property
+    def done(self) -> bool:
+        return not self.stale.any()
+
+    # edits
+
+    def update_bts(self, key: Hashable, bts: BaseStation):
+        """Adds a base station or replaces the state of an added one
+
+        Pass `bts.signal_map` to reuse a known coverage mask, it is calculated
+        during `step` otherwise.
+        """
+        stations = self.scenario.base_stations
+        i = self._bts_index.get(key)
+        if i is not None:
+            stations[i] = bts
+            self._bts_xy[i] = (bts.x, bts.y)
+        else:
+            self._bts_keys.append(key)
+            stations.append(bts)
+            self._bts_xy = np.vstack([self._bts_xy, [(bts.x, bts.y)]])
+            self.reachable = np.vstack(
+                [self.reachable, np.zeros((1, self._n_ue), "bool")]
+            )
+            self.stale = np.vstack([self.stale, np.ones((1, self._n_ue), "bool")])
+            self._remask = np.append(self._remask, True)
+            i = self._bts_index[key] = len(stations) - 1
+        self.stale[i] = True
+        self._remask[i] = True
+
+    def update_ue(self, key: Hashable, ue: UserEquipment):
+        """Adds a UE or replaces the state of an added one"""
+        ues = self.scenario.user_equipment
+        j = self._ue_index.get(key)
+        if j is not None:
+            ues[j] = ue
+            self._ue_xy[j] = (ue.x, ue.y)
+        else:
+            self._ue_keys.append(key)
+            ues.append(ue)
+            self._ue_xy = np.vstack([self._ue_xy, [(ue.x, ue.y)]])
+            self.reachable = np.hstack(
+                [self.reachable, np.zeros((self._n_bts, 1), "bool")]
+            )
+            self.stale = np.hstack([self.stale, np.ones((self._n_bts, 1), "bool")])
+            j = self._ue_index[key] = len(ues) - 1
+        self.stale[:, j] = True
+
+    def remove(self, key: Hashable):
+        """Removes a base station or a UE, does nothing for unknown keys"""
+        if key in self._bts_index:
+            i = self._bts_index.pop(key)
+            del self._bts_keys[i], self.scenario.base_stations[i]
+            _renumber(self._bts_index, self._bts_keys, i)
+            self._bts_xy = np.delete(self._bts_xy, i, 0)
+            self.reachable = np.delete(self.reachable, i, 0)
+            self.stale = np.delete(self.stale, i, 0)
+            self._remask = np.delete(self._remask, i)
+        elif key in self._ue_index:
+            j = self._ue_index.pop(key)
+            del self._ue_keys[j], self.scenario.user_equipment[j]
+            _renumber(self._ue_index, self._ue_keys, j)
+            self._ue_xy = np.delete(self._ue_xy, j, 0)
+            self.reachable = np.delete(self.reachable, j, 1)
+            self.stale = np.delete(self.stale, j, 1)
+
+    def obstacle_changed(
+        self,
+        box: Optional[Box],
+        obstacle_map: Optional[np.ndarray] = None,
+        loss_maps: Optional[tuple[np.ndarray, np.ndarray]] = None,
+    ):
+        """Marks the pairs whose ray may cross a changed part of the obstacle map
+
+        Args:
+            box (Box | None): changed area, None if nothing changed
+            obstacle_map (np.ndarray, optional): replacement obstacle mask,
+            e.g. after the area was resized. Marks every pair stale.
+            loss_maps (tuple[np.ndarray, np.ndarray], optional): replacement
+            (attenuation, heights), see `Scenario.loss_maps`
+        """
+        replaced = obstacle_map is not None and obstacle_map is not self.obstacle_map
+        if replaced:
+            self.scenario.obstacle_mask = obstacle_map
+        if self._losses and loss_maps is not None:
+            old = self.scenario.obstacle_loss
+            if any(new is not o for new, o in zip(loss_maps, old)):
+                self.scenario.obstacle_loss = loss_maps
+                replaced = True
+        if replaced:
+            self.stale[:] = True
+            self._remask[:] = True
+            return
+        if box is None:
+            return
+        x0, y0, x1, y1 = box
+        b, u = self._bts_xy[:, None, :], self._ue_xy[None, :, :]
+        lo, hi = np.minimum(b, u), np.maximum(b, u)
+        # bounding boxes of the rays overlapping the box, a superset of the hits
+        crossed = (
+            (lo[..., 0] <= x1)
+            & (hi[..., 0] >= x0)
+            & (lo[..., 1] <= y1)
+            & (hi[..., 1] >= y0)
+        )
+        self.stale |= crossed
+        if self._losses:
+            # masks cover the whole coverage window, not only the current UEs
+            for i, bts in enumerate(self.scenario.base_stations):
+                h, w = bts.coverage(self.scenario.grid).shape
+                self._remask[i] |= (
+                    bts.x - w // 2 <= x1
+                    and bts.x + w // 2 >= x0
+                    and bts.y - h // 2 <= y1
+                    and bts.y + h // 2 >= y0
+                )
+
+    # evaluation
+
+    @property
+    def _n_bts(self) -> int:
+        return len(self._bts_keys)
+
+    @property
+    def _n_ue(self) -> int:
+        return len(self._ue_keys)
+
+    def step(self, budget: float = 0.01) -> bool:
+        """Recomputes stale entries for about `budget` seconds
+
+        At least one base station row is processed per call, so progress is
+        made with any budget.
+
+        Returns:
+            bool: True when the matrix is up to date
+        """
+        deadline = time.perf_counter() + budget
+        lookup = self._attenuated_lookup if self._losses else self._traced_lookup
+        for i in np.flatnonzero(self.stale.any(axis=1)):
+            j = np.flatnonzero(self.stale[i])
+            self.reachable[i, j] = lookup(i, j)
+            self.stale[i, j] = False
+            if time.perf_counter() > deadline:
+                break
+        return self.done
+
+    def _traced_lookup(self, i: int, j: np.ndarray) -> np.ndarray:
+        bts = self.scenario.base_stations[i]
+        covered = coverage_lookup(
+            bts.coverage(self.scenario.grid), (bts.x, bts.y), self._ue_xy[j]
+        )
+        hit = covered.nonzero()[0]
+        covered[hit] = pair_line_of_sight(
+            np.broadcast_to(self._bts_xy[i], (len(hit), 2)),
+            self._ue_xy[j[hit]],
+            self.obstacle_map,
+        )
+        return covered
+
+    def _attenuated_lookup(self, i: int, j: np.ndarray) -> np.ndarray:
+        bts = self.scenario.base_stations[i]
+        if self._remask[i]:
+            bts.reachable_map = None
+            self._remask[i] = False
+        attenuation, heights = self.scenario.obstacle_loss
+        mask = bts.attenuated(
+            attenuation,
+            heights if self.scenario.diffraction else None,
+            self.scenario.grid,
+        )
+        return coverage_lookup(mask, (bts.x, bts.y), self._ue_xy[j])
+
+    def result(self) -> SimulationResult:
+        """Snapshot of the current, possibly partially stale, results"""
+        scenario = replace(
+            self.scenario,
+            base_stations=list(self.scenario.base_stations),
+            user_equipment=list(self.scenario.user_equipment),
+        )
+        return SimulationResult(scenario, self.reachable.copy(), self.obstacle_map)
@@ -0,0 +1,159 @@
+"""Coarse-to-fine evaluation of coverage masks.
+
+The signal level is first sampled on the corners of `block`-sized blocks.
+Blocks whose corners agree and are far enough from the threshold are filled
+with that decision, only the rest are evaluated cell by cell. Lobes and nulls
+of the pattern can fall between the corners, so every block within the `reach`
+of the base station, where the best antenna gain could still cover a cell, is
+evaluated cell by cell as well. Beyond it no cell can be covered.
+"""
+
+from typing import Callable, Optional
+import numpy as np
+from patterns import interpolated_gain, pattern_gain, peak_gain
+from . import geometry
+from .propagation import FREE_SPACE, PathLossModel
+
+MAX_CELLS = 1 << 22
+"""Upper bound of cells refined at once, limits temporary memory"""
+
+
+def signal_level(
+    dy: np.ndarray,
+    dx: np.ndarray,
+    power: float,
+    dh: float,
+    angle: int,
+    tilt: int,
+    pattern: np.ndarray,
+    cell_size: float,
+    angle_step: float = 1.0,
+    model: PathLossModel = FREE_SPACE,
+    frequency: float = 900.0,
+    height: Optional[float] = None,
+) -> np.ndarray:
+    """Evaluates P_t + G_t - table(d) of a path-loss model at arbitrary offsets
+
+    Uses the same arithmetic as the lookup tables of `engine.calc_signal_map`,
+    so both give identical values.
+
+    Args:
+        dy (np.ndarray), dx (np.ndarray): integer offsets from the base station
+        power (float): transmit power in dBm
+        dh (float): height of the antenna above the receiver in meters
+        angle (int), tilt (int): antenna orientation in degrees
+        pattern (np.ndarray): (2,360) or full-sphere (360,360) radiation pattern
+        cell_size (float): size of a grid cell in km
+        angle_step (float, optional): pattern resolution, see `Grid.angle_step`
+        model (PathLossModel, optional): propagation model. Defaults to free space.
+        frequency (float, optional): carrier frequency in MHz
+        height (float, optional): antenna height above ground. Defaults to `dh`.
+
+    Returns:
+        np.ndarray: signal level, compare it with `model.threshold`
+    """
+    dy, dx = np.asarray(dy, np.float64), np.asarray(dx, np.float64)
+    d2 = dy**2 + dx**2
+    height = dh if height is None else height
+    level = power - model.table(d2, cell_size, frequency, height, dh)
+    azimuth = np.rad2deg(np.arctan2(dy, dx))
+    elevation = np.rad2deg(np.arctan2(dh / 1000, np.sqrt(d2) * cell_size))
+    if angle_step < 1:
+        az = geometry.angle_index(azimuth, angle_step)
+        el = geometry.angle_index(elevation, angle_step)
+        level += interpolated_gain(
+            pattern,
+            (az.index + angle) % 360,
+            az.weight,
+            (el.index + tilt) % 360,
+            el.weight,
+        )
+        return level
+    azimuth = np.trunc(azimuth).astype(np.int64)
+    elevation = np.rint(elevation)
+    level += pattern_gain(
+        pattern, (azimuth + angle) % 360, (elevation.astype(np.int64) + tilt) % 360
+    )
+    return level
+
+
+def reach(
+    power: float,
+    pattern: np.ndarray,
+    threshold: float,
+    half: int,
+    cell_size: float,
+    model: PathLossModel = FREE_SPACE,
+    frequency: float = 900.0,
+    height: float = 0.0,
+    dh: float = 0.0,
+) -> int:
+    """Radius in cells beyond which no cell can be covered, -1 if none is
+
+    Bounded by the best possible antenna gain and by `half`. Path loss grows
+    with the distance, so the level is only evaluated along one axis.
+    """
+    r = np.arange(half + 1, dtype=np.float64)
+    loss = model.table(r**2, cell_size, frequency, height, dh)
+    covered = np.flatnonzero(power + peak_gain(pattern) - loss > threshold)
+    if not covered.size:
+        return -1
+    # cells between two samples may still be covered
+    return int(min(half, covered[-1] + 1))
+
+
+def coarse_to_fine(
+    evaluate: Callable[[np.ndarray, np.ndarray], np.ndarray],
+    half: int,
+    block: int,
+    margin: float,
+    radius: Optional[int] = None,
+) -> np.ndarray:
+    """Thresholds a field over the offsets -half..half-1 block by block
+
+    Args:
+        evaluate (Callable): maps (dy, dx) offset arrays to values, positive
+        where the cell is covered
+        half (int): half size of the window
+        block (int): block size in cells
+        margin (float): corner values closer than this to 0 force a refinement
+        radius (int, optional): blocks closer than this to the origin are always
+        refined, see `reach`. Defaults to the block of the origin only.
+
+    Returns:
+        np.ndarray: (2*half, 2*half) boolean mask indexed [dy + half, dx + half]
+    """
+    starts = np.arange(-half, half, block)
+    nodes = np.append(starts, half)
+    sizes = np.diff(nodes)
+    values = evaluate(nodes[:, None], nodes[None, :])
+    covered = values > 0
+    near = np.abs(values) < margin
+
+    corners = (covered[:-1, :-1], covered[:-1, 1:], covered[1:, :-1], covered[1:, 1:])
+    uniform = (corners[0] == corners[1]) & (corners[0] == corners[2])
+    uniform &= corners[0] == corners[3]
+    uniform &= ~(near[:-1, :-1] | near[:-1, 1:] | near[1:, :-1] | near[1:, 1:])
+    # the peak at the base station can hide between the corners
+    center = np.searchsorted(starts, 0, side="right") - 1
+    uniform[center, center] = False
+    if radius is not None and radius >= 0:
+        # distance of the block cells closest to the origin, per axis
+        nearest = np.maximum(0, np.maximum(starts, -(nodes[1:] - 1)))
+        uniform &= nearest[:, None] ** 2 + nearest[None, :] ** 2 > radius**2
+
+    mask = np.repeat(np.repeat(corners[0] & uniform, sizes, 0), sizes, 1)
+    bi, bj = np.nonzero(~uniform)
+    offsets = np.arange(block)
+    chunk = max(1, MAX_CELLS // block**2)
+    for start in range(0, len(bi), chunk):
+        i, j = bi[start : start + chunk], bj[start : start + chunk]
+        dy = starts[i, None, None] + offsets[None, :, None]
+        dx = starts[j, None, None] + offsets[None, None, :]
+        valid = (offsets[None, :, None] < sizes[i, None, None]) & (
+            offsets[None, None, :] < sizes[j, None, None]
+        )
+        dy, dx = np.broadcast_arrays(dy, dx)
+        dy, dx = dy[valid], dx[valid]
+        mask[dy + half, dx + half] = evaluate(dy, dx) > 0
+    return mask
@@ -0,0 +1,200 @@
+"""Connectivity and routing between UEs over the base station network.
+
+The network is a graph of base stations linked by backhaul, with every UE
+attached to the base stations it has signal from. UEs don't relay traffic, so
+two UEs are connected when they reach base stations of the same backhaul
+component. Components are found with union-find and routes with Dijkstra's
+algorithm run from every base station, which keeps the all-pairs UE matrices
+a few array operations even for hundreds of UEs.
+"""
+
+from collections.abc import Iterable, Sequence
+from typing import Optional
+import heapq
+import numpy as np
+
+METRICS = ("hops", "distance")
+"""Route costs: number of links, or their length in km"""
+
+
+class UnionFind:
+    """Disjoint sets of the integers 0..n-1"""
+
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]  # path halving
+            i = parent[i]
+        return i
+
+    def union(self, i: int, j: int):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+
+    def labels(self) -> np.ndarray:
+        """Component label of every element, the smallest element of its set"""
+        return np.array([self.find(i) for i in range(len(self.parent))], np.int64)
+
+
+class Network:
+    """UE-BTS reachability graph plus the BTS backhaul graph
+
+    Args:
+        bts_names (Sequence[str]), bts_xy: base stations and their (n_bts, 2)
+        positions
+        ue_names (Sequence[str]), ue_xy: UEs and their (n_ue, 2) positions
+        reachable (np.ndarray): (n_bts, n_ue) matrix from `simulate`
+        backhaul (Iterable[tuple[str, str]], optional): links between base
+        stations. Defaults to linking every pair of base stations.
+        metric (str, optional): one of `METRICS`. Defaults to "hops".
+        cell_size (float, optional): size of a grid cell in km
+    """
+
+    def __init__(
+        self,
+        bts_names: Sequence[str],
+        bts_xy: np.ndarray,
+        ue_names: Sequence[str],
+        ue_xy: np.ndarray,
+        reachable: np.ndarray,
+        backhaul: Optional[Iterable[tuple[str, str]]] = None,
+        metric: str = "hops",
+        cell_size: float = 1.0,
+    ) -> None:
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}, use one of {METRICS}")
+        self.bts_names = list(bts_names)
+        self.ue_names = list(ue_names)
+        self._bts_index = {name: i for i, name in enumerate(self.bts_names)}
+        self._ue_index = {name: i for i, name in enumerate(self.ue_names)}
+        self.reachable = np.asarray(reachable, "bool")
+        bts_xy = np.asarray(bts_xy, np.float64).reshape(-1, 2)
+        ue_xy = np.asarray(ue_xy, np.float64).reshape(-1, 2)
+        n = len(self.bts_names)
+
+        if backhaul is None:
+            links = [(i, j) for i in range(n) for j in range(i + 1, n)]
+        else:
+            links = [(self._bts_index[a], self._bts_index[b]) for a, b in backhaul]
+
+        def length(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+            if metric == "hops":
+                return np.ones(np.broadcast_shapes(a.shape, b.shape)[:-1])
+            return np.linalg.norm(a - b, axis=-1) * cell_size
+
+        ends = np.array(links, np.int64).reshape(-1, 2)
+        weights = length(bts_xy[ends[:, 0]], bts_xy[ends[:, 1]])
+        self.adjacency: list[dict[int, float]] = [{} for _ in range(n)]
+        for (i, j), w in zip(ends.tolist(), weights.tolist()):
+            if i != j:
+                w = min(w, self.adjacency[i].get(j, np.inf))
+                self.adjacency[i][j] = self.adjacency[j][i] = w
+
+        # (n_ue, n_bts) cost of the radio link, inf where there is no signal
+        self.access = np.where(
+            self.reachable.T, length(ue_xy[:, None], bts_xy[None, :]), np.inf
+        )
+        self._paths: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+    def components(self) -> np.ndarray:
+        """Backhaul component label of every base station"""
+        uf = UnionFind(len(self.bts_names))
+        for i, neighbours in enumerate(self.adjacency):
+            for j in neighbours:
+                if i < j:
+                    uf.union(i, j)
+        return uf.labels()
+
+    def connectivity(self) -> np.ndarray:
+        """(n_ue, n_ue) boolean matrix, True where two UEs can reach each other
+
+        A UE without signal isn't connected to anything, not even itself.
+        """
+        labels = self.components()
+        _, label_idx = np.unique(labels, return_inverse=True)
+        # (n_ue, n_components) membership of the UEs in the components
+        member = np.zeros((len(self.ue_names), label_idx.max(initial=-1) + 1), "bool")
+        ue, bts = np.nonzero(self.reachable.T)
+        member[ue, label_idx[bts]] = True
+        m = member.astype(np.int32)
+        return (m @ m.T) > 0
+
+    def _bts_paths(self) -> tuple[np.ndarray, np.ndarray]:
+        """All-pairs BTS route costs and predecessors, from Dijkstra per BTS"""
+        if self._paths is not None:
+            return self._paths
+        n = len(self.bts_names)
+        cost = np.full((n, n), np.inf)
+        pred = np.full((n, n), -1, np.int64)
+        for src in range(n):
+            dist, prev = cost[src], pred[src]
+            dist[src] = 0.0
+            heap = [(0.0, src)]
+            while heap:
+                d, i = heapq.heappop(heap)
+                if d > dist[i]:
+                    continue
+                for j, w in self.adjacency[i].items():
+                    if d + w < dist[j]:
+                        dist[j], prev[j] = d + w, i
+                        heapq.heappush(heap, (d + w, j))
+        self._paths = cost, pred
+        return self._paths
+
+    def costs(self) -> np.ndarray:
+        """(n_ue, n_ue) cost of the best route between UEs, inf if there is none"""
+        cost, _ = self._bts_paths()
+        n_ue, n_bts = self.access.shape
+        out = np.full((n_ue, n_ue), np.inf)
+        if n_bts == 0:
+            return out
+        # min over a of access[i, a] + cost[a, b], then min over b with access[j, b]
+        to_bts = np.empty((n_ue, n_bts))
+        for i in range(n_ue):
+            to_bts[i] = np.min(self.access[i, :, None] + cost, axis=0)
+        for i in range(n_ue):
+            out[i] = np.min(to_bts[i, None, :] + self.access, axis=1)
+        return out
+
+    def route(self, ue1: str, ue2: str) -> Optional[list[str]]:
+        """Cheapest route between two UEs
+
+        Returns:
+            list[str] | None: [ue1, bts, ..., ue2] or None if there is no route
+        """
+        i, j = self._ue_index[ue1], self._ue_index[ue2]
+        cost, pred = self._bts_paths()
+        total = self.access[i, :, None] + cost + self.access[j, None, :]
+        if total.size == 0:
+            return None
+        a, b = np.unravel_index(np.argmin(total), total.shape)
+        if not np.isfinite(total[a, b]):
+            return None
+        path = [b]
+        while path[-1] != a:
+            path.append(pred[a, path[-1]])
+        return [ue1, *(self.bts_names[k] for k in reversed(path)), ue2]
+
+    def report(self, ues: Optional[Sequence[str]] = None) -> list[str]:
+        """Human readable lines with the signal and routes of the given UEs
+
+        Args:
+            ues (Sequence[str], optional): UEs to report. Defaults to all.
+        """
+        ues = self.ue_names if ues is None else list(ues)
+        lines = []
+        for ue in ues:
+            col = self.reachable[:, self._ue_index[ue]]
+            bts = [name for name, ok in zip(self.bts_names, col) if ok]
+            lines.append(
+                f"UE {ue} can connect to: {bts}" if bts else f"ERR: {ue} has no signal!"
+            )
+        for k, ue1 in enumerate(ues):
+            for ue2 in ues[k + 1 :]:
+                path = self.route(ue1, ue2)
+                lines.append("->".join(path) if path else f"No route {ue1} - {ue2}")
+        return lines
@@ -0,0 +1,168 @@
+"""Parallel calculation of coverage masks over a process pool.
+
+Coverage masks of different base stations are independent, so cache misses
+are spread over worker processes. The geometry tables of the grid are placed
+in `multiprocessing.shared_memory` once and attached by every worker instead
+of being rebuilt or copied per process. Without usable worker processes the
+masks are calculated serially, with a `RuntimeWarning`.
+"""
+
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+import os
+import warnings
+import numpy as np
+from . import engine, geometry
+from .engine import DEFAULT_GRID, BaseStation
+from .geometry import Grid
+
+_ATTACHED: list[shared_memory.SharedMemory] = []
+"""Shared memory blocks kept alive in a worker process"""
+
+
+class SharedTables:
+    """Geometry tables of one grid copied into shared memory"""
+
+    def __init__(self, half: int) -> None:
+        q = geometry.quadrant(half)
+        arrays = {**q._asdict(), "full_azimuth": geometry.azimuth(half)}
+        self.half = half
+        self.blocks: list[shared_memory.SharedMemory] = []
+        self.spec = []
+        for name, arr in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+            self.blocks.append(shm)
+            self.spec.append((name, shm.name, arr.shape, arr.dtype.str))
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks.clear()
+
+
+def _attach(half: int, spec: list):
+    arrays = {}
+    for name, shm_name, shape, dtype in spec:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _ATTACHED.append(shm)
+        arrays[name] = np.ndarray(shape, dtype, buffer=shm.buf)
+    full_azimuth = arrays.pop("full_azimuth")
+    geometry.install(half, geometry.Quadrant(**arrays), full_azimuth)
+
+
+def _calc(args) -> np.ndarray:
+    return engine._calc_signal_map(*args)
+
+
+class ParallelBackend:
+    """Process pool calculating coverage masks, use it as a context manager
+
+    Args:
+        workers (int, optional): number of processes. Defaults to the CPU count.
+        grid (Grid, optional): grid whose tables are shared with the workers.
+    """
+
+    def __init__(self, workers: Optional[int] = None, grid: Grid = DEFAULT_GRID):
+        self.workers = workers or os.cpu_count() or 1
+        self.grid = grid
+        self._tables: Optional[SharedTables] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._failed = False
+
+    def _start(self) -> Optional[ProcessPoolExecutor]:
+        """Starts the pool on first use, None if running serially"""
+        if self._pool is not None or self.workers < 2 or self._failed:
+            return self._pool
+        try:
+            initargs = ()
+            if self.grid.refine == 1:  # coarse-to-fine evaluation needs no tables
+                self._tables = SharedTables(self.grid.half)
+                initargs = (self.grid.half, self._tables.spec)
+            self._pool = ProcessPoolExecutor(
+                self.workers,
+                initializer=_attach if initargs else None,
+                initargs=initargs,
+            )
+        except (OSError, ImportError, NotImplementedError) as e:
+            warnings.warn(
+                f"Parallel backend unavailable, running serially: {e}",
+                RuntimeWarning,
+                stacklevel=3,
+            )
+            self._failed = True
+            self.close()
+        return self._pool
+
+    def calc_signal_maps(
+        self, stations: Sequence[BaseStation], grid: Optional[Grid] = None
+    ) -> list[np.ndarray]:
+        """Calculates coverage masks of many base stations
+
+        Masks already in `SIGNAL_MAP_CACHE` are reused and identical radio
+        parameters are calculated once. New masks are added to the cache.
+
+        Returns:
+            list[np.ndarray]: mask of every station, in order
+        """
+        grid = grid or self.grid
+        cache = engine.SIGNAL_MAP_CACHE
+        args = [
+            (
+                b.power,
+                b.height,
+                b.angle,
+                b.tilt,
+                b.pattern,
+                grid,
+                b.model,
+                b.frequency,
+                b.sensitivity,
+            )
+            for b in stations
+        ]
+        keys = [engine.signal_map_key(*a) for a in args]
+        maps = {k: cache.get(k) for k in set(keys)}
+        missing = {}
+        for key, a in zip(keys, args):
+            if maps[key] is None:
+                missing[key] = a
+        pool = self._start() if len(missing) > 1 else None
+        results = (pool.map if pool else map)(_calc, missing.values())
+        for key, signal_map in zip(missing, results):
+            maps[key] = cache.put(key, signal_map)
+        return [maps[k] for k in keys]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._tables is not None:
+            self._tables.close()
+            self._tables = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def calc_signal_maps(
+    stations: Sequence[BaseStation],
+    grid: Grid = DEFAULT_GRID,
+    workers: Optional[int] = None,
+) -> list[np.ndarray]:
+    """Calculates coverage masks of many base stations with a temporary pool
+
+    Args:
+        stations (Sequence[BaseStation]): base stations to calculate
+        grid (Grid, optional): calculation grid. Defaults to `DEFAULT_GRID`.
+        workers (int, optional): number of processes, 1 runs serially.
+        Defaults to the CPU count.
+    """
+    with ParallelBackend(workers, grid) as backend:
+        return backend.calc_signal_maps(stations)
@@ -0,0 +1,253 @@
+"""Vectorized path-loss models.
+
+A model splits the path loss into a distance-dependent part and a constant.
+The distance part is tabulated over a grid quadrant once per model, frequency,
+cell size and antenna height, and shared like `geometry.height_tables`. The
+constant is folded into the detection threshold, so a base station covers a
+cell when
+
+    P_t + G_t - table(d) > model.threshold(sensitivity, frequency, height, dh)
+
+Frequencies are in MHz, heights in meters and distances in km, except for
+`FreeSpace` which keeps the original units of the simulator.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from statistics import NormalDist
+import numpy as np
+from . import geometry
+
+ENVIRONMENTS = ("urban", "suburban", "open")
+"""Area types of `OkumuraHata`"""
+
+
+class PathLossModel(ABC):
+    """Interface of the path-loss models
+
+    Models are frozen dataclasses, so they can be used in cache keys and sent
+    to worker processes. All methods take the carrier `frequency`, the antenna
+    `height` above ground and its height `dh` above the receiver.
+    """
+
+    @abstractmethod
+    def table(
+        self,
+        d2: np.ndarray,
+        cell_size: float,
+        frequency: float,
+        height: float,
+        dh: float,
+    ) -> np.ndarray:
+        """Distance-dependent part of the loss in dB
+
+        Args:
+            d2 (np.ndarray): float64 squared horizontal distances in cells
+            cell_size (float): size of a grid cell in km
+        """
+
+    @abstractmethod
+    def offset(self, frequency: float, height: float, dh: float) -> float:
+        """Constant part of the loss in dB"""
+
+    def threshold(
+        self, sensitivity: float, frequency: float, height: float, dh: float
+    ) -> float:
+        """Signal level P_t + G_t - table(d) a covered cell has to exceed"""
+        return sensitivity + self.offset(frequency, height, dh)
+
+    def loss(
+        self,
+        d2: np.ndarray,
+        cell_size: float,
+        frequency: float,
+        height: float,
+        dh: float,
+    ) -> np.ndarray:
+        """Total path loss in dB"""
+        return self.table(d2, cell_size, frequency, height, dh) + self.offset(
+            frequency, height, dh
+        )
+
+    def quadrant(
+        self, half: int, cell_size: float, frequency: float, height: float, dh: float
+    ) -> np.ndarray:
+        """Cached read-only quadrant of `table`, expand it with `mirror_index`"""
+
+        def compute() -> np.ndarray:
+            d2 = geometry.quadrant(half).distance.astype(np.float64)
+            table = self.table(d2, cell_size, frequency, height, dh)
+            table.flags.writeable = False
+            return table
+
+        key = (
+            "loss",
+            self,
+            half,
+            float(cell_size),
+            float(frequency),
+            float(height),
+            float(dh),
+        )
+        return geometry.HEIGHT_CACHE.get_or_compute(key, compute)
+
+
+def _distance_km(
+    d2: np.ndarray, cell_size: float, dh: float, minimum: float
+) -> np.ndarray:
+    """3D distance in km, clipped to `minimum`"""
+    d = np.sqrt(d2 * cell_size**2 + (dh / 1000) ** 2)
+    return np.maximum(d, minimum)
+
+
+@dataclass(frozen=True)
+class FreeSpace(PathLossModel):
+    """Friis free-space loss, the original model of the simulator
+
+    The loss is 32.5 + 20 * log10(f) + 10 * log10(d**2 + dh**2) with d in
+    cells of `cell_size` and dh in meters, exactly as `RECV_MAGIC` assumes.
+    """
+
+    def table(self, d2, cell_size, frequency, height, dh):
+        return 10 * np.log10(d2 * cell_size**2 + dh**2)
+
+    def offset(self, frequency, height, dh):
+        return 32.5 + 20 * np.log10(frequency)
+
+    def threshold(self, sensitivity, frequency, height, dh):
+        # same operation order as RECV_MAGIC, so default masks stay identical
+        return sensitivity + 32.5 + 20 * np.log10(frequency)
+
+    def quadrant(self, half, cell_size, frequency, height, dh):
+        # frequency only shifts the threshold, share the per-height tables
+        return geometry.height_tables(half, cell_size, dh).path_loss
+
+
+@dataclass(frozen=True)
+class LogDistance(PathLossModel):
+    """Log-distance loss with log-normal shadowing
+
+    L = FSPL(d0) + 10 * n * log10(d / d0) + sigma * Q^-1(1 - reliability)
+
+    Shadowing enters as the fade margin that keeps the fraction `reliability`
+    of locations at the coverage edge above the sensitivity.
+    """
+
+    exponent: float = 3.5
+    """Path-loss exponent n, 2 in free space and 3-5 in built-up areas"""
+    reference: float = 1.0
+    """Reference distance d0 in km, closer cells get the loss at d0"""
+    sigma: float = 0.0
+    """Standard deviation of the shadowing in dB"""
+    reliability: float = 0.5
+    """Required probability of coverage at the edge, 0.5 adds no margin"""
+
+    def __post_init__(self):
+        if not 0 < self.reliability < 1:
+            raise ValueError(f"reliability must be in (0, 1), got {self.reliability}")
+        if self.reference <= 0:
+            raise ValueError(f"reference must be positive, got {self.reference}")
+
+    def table(self, d2, cell_size, frequency, height, dh):
+        d = _distance_km(d2, cell_size, dh, self.reference)
+        return 10 * self.exponent * np.log10(d / self.reference)
+
+    def offset(self, frequency, height, dh):
+        fspl = 32.45 + 20 * np.log10(frequency) + 20 * np.log10(self.reference)
+        return fspl + self.sigma * NormalDist().inv_cdf(self.reliability)
+
+
+def _mobile_correction(frequency: float, ue_height: float, large_city: bool) -> float:
+    """Hata correction a(h_m) of the mobile antenna height"""
+    if large_city:
+        if frequency < 300:
+            return 8.29 * np.log10(1.54 * ue_height) ** 2 - 1.1
+        return 3.2 * np.log10(11.75 * ue_height) ** 2 - 4.97
+    log_f = np.log10(frequency)
+    return (1.1 * log_f - 0.7) * ue_height - (1.56 * log_f - 0.8)
+
+
+@dataclass(frozen=True)
+class _Hata(PathLossModel):
+    """Common part of the Hata models
+
+    L = A + B * log10(f) - 13.82 * log10(h_b) - a(h_m)
+        + (44.9 - 6.55 * log10(h_b)) * log10(d) + C
+    """
+
+    large_city: bool = False
+    """Use the large city correction of the mobile antenna height"""
+    min_distance: float = 0.1
+    """Closer cells get the loss at this distance in km"""
+
+    _coefficients = (69.55, 26.16)  # A, B
+
+    def table(self, d2, cell_size, frequency, height, dh):
+        d = _distance_km(d2, cell_size, dh, self.min_distance)
+        return (44.9 - 6.55 * np.log10(max(height, 1.0))) * np.log10(d)
+
+    def correction(self, frequency: float) -> float:
+        """Area correction C in dB"""
+        return 0.0
+
+    def offset(self, frequency, height, dh):
+        a, b = self._coefficients
+        return (
+            a
+            + b * np.log10(frequency)
+            - 13.82 * np.log10(max(height, 1.0))
+            - _mobile_correction(frequency, height - dh, self.large_city)
+            + self.correction(frequency)
+        )
+
+
+@dataclass(frozen=True)
+class OkumuraHata(_Hata):
+    """Okumura-Hata model, valid for 150-1500 MHz, 1-20 km and BTS at 30-200 m
+
+    Outside of these ranges the formulas are extrapolated.
+    """
+
+    environment: str = "urban"
+    """One of `ENVIRONMENTS`"""
+
+    def __post_init__(self):
+        if self.environment not in ENVIRONMENTS:
+            raise ValueError(
+                f"Unknown environment {self.environment!r}, use one of {ENVIRONMENTS}"
+            )
+
+    def correction(self, frequency):
+        log_f = np.log10(frequency)
+        if self.environment == "suburban":
+            return -2 * np.log10(frequency / 28) ** 2 - 5.4
+        if self.environment == "open":
+            return -4.78 * log_f**2 + 18.33 * log_f - 40.94
+        return 0.0
+
+
+@dataclass(frozen=True)
+class Cost231(_Hata):
+    """COST-231 extension of the Hata model to 1500-2000 MHz
+
+    `metropolitan` adds the 3 dB correction of dense city centres.
+    """
+
+    metropolitan: bool = False
+
+    _coefficients = (46.3, 33.9)
+
+    def correction(self, frequency):
+        return 3.0 if self.metropolitan else 0.0
+
+
+FREE_SPACE = FreeSpace()
+"""Default model of base stations"""
+
+MODELS: dict[str, PathLossModel] = {
+    "free space": FREE_SPACE,
+    "log-distance": LogDistance(),
+    "okumura-hata": OkumuraHata(),
+    "cost-231": Cost231(),
+}
+"""Models with default parameters by name"""
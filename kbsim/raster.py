@@ -0,0 +1,197 @@
+"""Incrementally maintained obstacle raster.
+
+Every obstacle is stamped into a per-pixel reference count, touching only its
+bounding box, so adding, moving, resizing or deleting one obstacle never
+rebuilds the whole map. Overlapping obstacles keep a pixel blocked until the
+last of them is gone. Attenuation and height layers, for `shadow.loss_map`,
+are rebuilt within the changed box from the obstacles overlapping it, where
+overlapping obstacles keep the larger value. Obstacles are bucketed by the
+tiles their boxes touch, so finding them doesn't depend on the total count.
+"""
+
+from functools import lru_cache
+from typing import Hashable, Iterator, Optional
+import numpy as np
+
+Box = tuple[int, int, int, int]
+Stamp = tuple[int, int, int, float, float]  # x, y, size, attenuation, height
+
+OBSTACLE_HEIGHT = 30.0  # m
+"""Default height of obstacles"""
+TILE = 64
+"""Size of the tiles obstacles are bucketed by"""
+
+
+@lru_cache(maxsize=64)
+def disc(size: int) -> np.ndarray:
+    """Boolean (2*size+1, 2*size+1) stamp of a disc with radius `size`"""
+    Y, X = np.ogrid[-size : size + 1, -size : size + 1]
+    stamp = X**2 + Y**2 <= size**2
+    stamp.flags.writeable = False
+    return stamp
+
+
+def stamp_window(
+    shape: tuple[int, int], x: int, y: int, size: int
+) -> tuple[tuple[slice, slice], np.ndarray]:
+    """Clips the disc stamp of an obstacle to a raster
+
+    Returns:
+        (window, stamp): slices of the raster covered by the obstacle and the
+        matching part of its disc
+    """
+    size = max(int(size), 0)
+    y0, y1 = max(y - size, 0), min(y + size + 1, shape[0])
+    x0, x1 = max(x - size, 0), min(x + size + 1, shape[1])
+    if y0 >= y1 or x0 >= x1:
+        return (slice(0, 0), slice(0, 0)), np.zeros((0, 0), "bool")
+    stamp = disc(size)[y0 - y + size : y1 - y + size, x0 - x + size : x1 - x + size]
+    return (slice(y0, y1), slice(x0, x1)), stamp
+
+
+def _bounds(stamp: Stamp) -> Box:
+    x, y, size = stamp[:3]
+    size = max(size, 0)
+    return x - size, y - size, x + size, y + size
+
+
+def _union(a: Box, b: Box) -> Box:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _tiles(box: Box) -> Iterator[tuple[int, int]]:
+    for tx in range(box[0] // TILE, box[2] // TILE + 1):
+        for ty in range(box[1] // TILE, box[3] // TILE + 1):
+            yield tx, ty
+
+
+class ObstacleRaster:
+    """Obstacle mask of the simulation area kept up to date in place"""
+
+    counts: np.ndarray
+    """(height, width) number of obstacles covering each pixel"""
+    mask: np.ndarray
+    """(height, width) boolean obstacle mask, see `Scenario.obstacle_map`"""
+    attenuation: np.ndarray
+    """(height, width) float32 penetration loss in dB, see `Scenario.loss_maps`"""
+    heights: np.ndarray
+    """(height, width) float32 obstacle heights in m, 0 where free"""
+
+    def __init__(self, width: int, height: int) -> None:
+        self._stamps: dict[Hashable, Stamp] = {}
+        self._tiles: dict[tuple[int, int], set[Hashable]] = {}
+        self._allocate(width, height)
+
+    def _allocate(self, width: int, height: int):
+        self.counts = np.zeros((height, width), np.uint16)
+        self.mask = np.zeros((height, width), "bool")
+        self.attenuation = np.zeros((height, width), np.float32)
+        self.heights = np.zeros((height, width), np.float32)
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.mask.shape
+
+    def __len__(self) -> int:
+        return len(self._stamps)
+
+    def _apply(self, stamp: Stamp, delta: int):
+        window, stamp = stamp_window(self.shape, *stamp[:3])
+        counts = self.counts[window]
+        if delta > 0:
+            counts[stamp] += 1
+        else:
+            counts[stamp] -= 1
+        self.mask[window] = counts > 0
+
+    def _index(self, key: Hashable, stamp: Stamp):
+        for tile in _tiles(_bounds(stamp)):
+            self._tiles.setdefault(tile, set()).add(key)
+
+    def _unindex(self, key: Hashable, stamp: Stamp):
+        for tile in _tiles(_bounds(stamp)):
+            keys = self._tiles[tile]
+            keys.discard(key)
+            if not keys:
+                del self._tiles[tile]
+
+    def _restamp_layers(self, box: Box):
+        """Rebuilds the attenuation and height layers within a box"""
+        x0, y0 = max(box[0], 0), max(box[1], 0)
+        x1, y1 = min(box[2] + 1, self.shape[1]), min(box[3] + 1, self.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        attenuation = self.attenuation[y0:y1, x0:x1]
+        heights = self.heights[y0:y1, x0:x1]
+        attenuation[:] = 0
+        heights[:] = 0
+        keys = set()
+        for tile in _tiles((x0, y0, x1 - 1, y1 - 1)):
+            keys.update(self._tiles.get(tile, ()))
+        for key in keys:
+            x, y, size, loss, height = self._stamps[key]
+            window, stamp = stamp_window(attenuation.shape, x - x0, y - y0, size)
+            part = attenuation[window]
+            part[stamp] = np.maximum(part[stamp], loss)
+            part = heights[window]
+            part[stamp] = np.maximum(part[stamp], height)
+
+    def update(
+        self,
+        key: Hashable,
+        x: int,
+        y: int,
+        size: int,
+        attenuation: float = np.inf,
+        height: float = OBSTACLE_HEIGHT,
+    ) -> Optional[Box]:
+        """Adds an obstacle or moves/resizes/changes an already added one
+
+        Args:
+            key (Hashable): identity of the obstacle
+            x (int), y (int): center of the obstacle
+            size (int): radius of the obstacle
+            attenuation (float, optional): penetration loss in dB. Defaults to
+            inf, an opaque obstacle.
+            height (float, optional): height in m. Defaults to `OBSTACLE_HEIGHT`.
+
+        Returns:
+            Box | None: inclusive (x0, y0, x1, y1) box of the changed pixels,
+            None if nothing changed
+        """
+        new = (int(x), int(y), int(size), float(attenuation), float(height))
+        old = self._stamps.get(key)
+        if old == new:
+            return None
+        if old is not None:
+            self._apply(old, -1)
+            self._unindex(key, old)
+        self._stamps[key] = new
+        self._apply(new, 1)
+        self._index(key, new)
+        box = _bounds(new) if old is None else _union(_bounds(old), _bounds(new))
+        self._restamp_layers(box)
+        return box
+
+    def discard(self, key: Hashable) -> Optional[Box]:
+        """Removes an obstacle, does nothing if it wasn't added
+
+        Returns:
+            Box | None: box of the changed pixels, see `update`
+        """
+        old = self._stamps.pop(key, None)
+        if old is None:
+            return None
+        self._apply(old, -1)
+        self._unindex(key, old)
+        self._restamp_layers(_bounds(old))
+        return _bounds(old)
+
+    def resize(self, width: int, height: int):
+        """Changes the raster size, restamping all obstacles"""
+        if self.shape == (height, width):
+            return
+        self._allocate(width, height)
+        for stamp in self._stamps.values():
+            self._apply(stamp, 1)
+        self._restamp_layers((0, 0, width - 1, height - 1))
@@ -0,0 +1,225 @@
+"""Scenario files: JSON objects plus an `.npz` sidecar of arrays.
+
+The JSON file lists the objects and simulation settings and references
+antenna patterns by content hash. The sidecar next to it, with the same stem,
+holds the patterns and the coverage masks already computed, keyed by a hash
+of every input of the mask. Loading puts the masks back into
+`SIGNAL_MAP_CACHE`, so base stations whose parameters didn't change skip the
+calculation, and edited ones are simply missing from the sidecar.
+"""
+
+from collections.abc import Sequence
+from dataclasses import asdict, fields
+from typing import NamedTuple, Optional
+import hashlib
+import json
+import os
+import pathlib as pl
+import numpy as np
+from .cache import array_hash
+from .engine import (
+    SIGNAL_MAP_CACHE,
+    BaseStation,
+    Obstacle,
+    Scenario,
+    UserEquipment,
+    signal_map_key,
+)
+from .geometry import Grid
+from .propagation import Cost231, FreeSpace, LogDistance, OkumuraHata, PathLossModel
+
+FORMAT = "kb_simulator-scenario"
+VERSION = 1
+_COVERAGE_VERSION = "coverage-1"  # change when the masks of the engine change
+MODEL_TYPES: dict[str, type[PathLossModel]] = {
+    cls.__name__: cls for cls in (FreeSpace, LogDistance, OkumuraHata, Cost231)
+}
+"""Path-loss models that can be stored, by class name"""
+
+
+class SavedScenario(NamedTuple):
+    scenario: Scenario
+    pattern_names: list[Optional[str]]
+    """Name of the pattern of every base station, e.g. a `PatternLibrary` ID"""
+
+
+def sidecar(path: pl.Path) -> pl.Path:
+    """Path of the array file of a scenario file"""
+    return pl.Path(path).with_suffix(".npz")
+
+
+def _map_key(bts: BaseStation, grid: Grid) -> tuple:
+    return signal_map_key(
+        bts.power,
+        bts.height,
+        bts.angle,
+        bts.tilt,
+        bts.pattern,
+        grid,
+        bts.model,
+        bts.frequency,
+        bts.sensitivity,
+    )
+
+
+def coverage_key(bts: BaseStation, grid: Grid) -> str:
+    """Hash of every input of the coverage mask of a base station"""
+    text = repr((_COVERAGE_VERSION, _map_key(bts, grid)))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _model_to_dict(model: PathLossModel) -> dict:
+    return {"type": type(model).__name__, **asdict(model)}
+
+
+def _model_from_dict(data: dict) -> PathLossModel:
+    data = dict(data)
+    name = data.pop("type")
+    if name not in MODEL_TYPES:
+        raise ValueError(f"Unknown path-loss model {name!r}")
+    return MODEL_TYPES[name](**data)
+
+
+def _fields(obj, skip: tuple[str, ...] = ()) -> dict:
+    return {f.name: getattr(obj, f.name) for f in fields(obj) if f.name not in skip}
+
+
+_BTS_ARRAYS = ("pattern", "signal_map", "reachable_map", "model")
+
+
+def save_scenario(
+    path: pl.Path,
+    scenario: Scenario,
+    pattern_names: Optional[Sequence[Optional[str]]] = None,
+):
+    """Writes a scenario file and its sidecar
+
+    Coverage masks known in memory are stored, as well as masks of the previous
+    sidecar that are still referenced.
+
+    Args:
+        path (Path): JSON file to write
+        scenario (Scenario): objects and settings, rasterized obstacles aren't
+        stored
+        pattern_names (Sequence[str | None], optional): name of the pattern of
+        every base station
+    """
+    path = pl.Path(path)
+    names = list(pattern_names or [None] * len(scenario.base_stations))
+    grid = scenario.grid
+    arrays: dict[str, np.ndarray] = {}
+    patterns: dict[str, dict] = {}
+    stations = []
+    for bts, name in zip(scenario.base_stations, names):
+        pattern = array_hash(bts.pattern)
+        patterns.setdefault(pattern, {"name": name})
+        arrays[f"pattern_{pattern}"] = np.asarray(bts.pattern)
+        key = coverage_key(bts, grid)
+        signal_map = bts.signal_map
+        if signal_map is None:
+            signal_map = SIGNAL_MAP_CACHE.get(_map_key(bts, grid))
+        if signal_map is not None:
+            arrays[f"coverage_{key}"] = signal_map
+        stations.append(
+            {
+                **_fields(bts, _BTS_ARRAYS),
+                "model": _model_to_dict(bts.model),
+                "pattern": pattern,
+                "coverage": key,
+            }
+        )
+
+    old = sidecar(path)
+    if old.exists():
+        wanted = {f"coverage_{s['coverage']}" for s in stations}
+        try:
+            with np.load(old) as previous:
+                for name in wanted - arrays.keys():
+                    if name in previous.files:
+                        arrays[name] = previous[name]
+        except (OSError, ValueError):
+            pass  # unreadable sidecar, only keep what is in memory
+
+    grid_data = asdict(grid)
+    data = {
+        "format": FORMAT,
+        "version": VERSION,
+        "width": scenario.width,
+        "height": scenario.height,
+        "grid": grid_data,
+        "backhaul": scenario.backhaul,
+        "penetration": scenario.penetration,
+        "diffraction": scenario.diffraction,
+        "patterns": patterns,
+        "base_stations": stations,
+        "user_equipment": [_fields(u) for u in scenario.user_equipment],
+        "obstacles": [_fields(o) for o in scenario.obstacles],
+    }
+    # write both files next to the targets first, a failure leaves the old ones
+    tmp_json, tmp_npz = path.with_suffix(".json.tmp"), path.with_suffix(".tmp.npz")
+    tmp_json.write_text(json.dumps(data, indent=1))
+    np.savez_compressed(tmp_npz, **arrays)
+    os.replace(tmp_npz, sidecar(path))
+    os.replace(tmp_json, path)
+
+
+def load_scenario(path: pl.Path) -> SavedScenario:
+    """Reads a scenario file, restoring the coverage masks of its sidecar
+
+    Raises:
+        ValueError: if the file isn't a scenario or a pattern is missing
+
+    Returns:
+        SavedScenario: scenario with the stored masks set on its base stations
+    """
+    path = pl.Path(path)
+    data = json.loads(path.read_text())
+    if data.get("format") != FORMAT:
+        raise ValueError(f"{path} is not a scenario file")
+    if data.get("version", 0) > VERSION:
+        raise ValueError(f"{path} needs a newer version of the simulator")
+    grid_data = data.get("grid", {})
+    if "extent" in grid_data:
+        grid_data["extent"] = tuple(grid_data["extent"])
+    grid = Grid(**grid_data)
+
+    npz = sidecar(path)
+    arrays = np.load(npz) if npz.exists() else None
+    try:
+        stations, names = [], []
+        for entry in data.get("base_stations", []):
+            entry = dict(entry)
+            pattern_hash = entry.pop("pattern")
+            entry.pop("coverage", None)
+            model = _model_from_dict(entry.pop("model", {"type": "FreeSpace"}))
+            try:
+                pattern = arrays[f"pattern_{pattern_hash}"]
+            except (KeyError, TypeError):
+                raise ValueError(f"Pattern {pattern_hash} missing in {npz}") from None
+            pattern.flags.writeable = False
+            bts = BaseStation(**entry, model=model, pattern=pattern)
+            # edited parameters give a key that isn't in the sidecar
+            key = coverage_key(bts, grid)
+            if f"coverage_{key}" in arrays.files:
+                signal_map = arrays[f"coverage_{key}"]
+                signal_map.flags.writeable = False
+                bts.signal_map = SIGNAL_MAP_CACHE.put(_map_key(bts, grid), signal_map)
+            stations.append(bts)
+            names.append(data.get("patterns", {}).get(pattern_hash, {}).get("name"))
+    finally:
+        if arrays is not None:
+            arrays.close()
+
+    backhaul = data.get("backhaul")
+    scenario = Scenario(
+        data["width"],
+        data["height"],
+        stations,
+        [UserEquipment(**u) for u in data.get("user_equipment", [])],
+        [Obstacle(**o) for o in data.get("obstacles", [])],
+        grid=grid,
+        backhaul=None if backhaul is None else [tuple(link) for link in backhaul],
+        penetration=data.get("penetration", False),
+        diffraction=data.get("diffraction", False),
+    )
+    return SavedScenario(scenario, names)
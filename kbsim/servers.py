@@ -0,0 +1,165 @@
+"""Best-server, RSRP and SINR maps.
+
+Received power of every base station is evaluated one station at a time and
+folded into running accumulators: the best power with its station index and
+the total received power in mW. No per-station map is kept, so memory only
+depends on the size of the evaluated area. Results are quantized to int16.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+from . import multires
+from .engine import DEFAULT_GRID, RECV_HEIGHT, BaseStation
+from .geometry import Grid
+from .tiles import reach
+
+NOISE_FLOOR = -174 + 10 * np.log10(200e3) + 7  # dBm, 200 kHz channel, 7 dB NF
+"""Thermal noise power of the receiver"""
+INTERFERENCE_MARGIN = 10  # dB
+"""Signals this far below the noise floor are left out of the interference"""
+STEP = 0.1  # dB
+"""Quantization step of `ServerMaps.rsrp` and `ServerMaps.sinr`"""
+NO_SIGNAL = np.iinfo(np.int16).min
+"""Quantized value of cells without a server"""
+
+
+@dataclass
+class ServerMaps:
+    """(height, width) rasters of a window of the simulation area"""
+
+    server: np.ndarray
+    """int16 index of the strongest base station, -1 if below sensitivity"""
+    rsrp: np.ndarray
+    """int16 received power of the best server in `STEP` dB, or `NO_SIGNAL`"""
+    sinr: np.ndarray
+    """int16 SINR of the best server in `STEP` dB, or `NO_SIGNAL`"""
+    origin: tuple[int, int] = (0, 0)
+    """Position (x, y) of the top-left cell in the simulation area"""
+
+    def rsrp_dbm(self) -> np.ndarray:
+        """Received power in dBm, NaN where there is no server"""
+        return _dequantize(self.rsrp)
+
+    def sinr_db(self) -> np.ndarray:
+        """SINR in dB, NaN where there is no server"""
+        return _dequantize(self.sinr)
+
+
+def _quantize(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    info = np.iinfo(np.int16)
+    q = np.clip(np.rint(values / STEP), info.min + 1, info.max)
+    return np.where(valid, q, NO_SIGNAL).astype(np.int16)
+
+
+def _dequantize(values: np.ndarray) -> np.ndarray:
+    return np.where(values == NO_SIGNAL, np.nan, values * np.float32(STEP))
+
+
+def _block(
+    power: np.ndarray,
+    bts: BaseStation,
+    grid: Grid,
+    mask: np.ndarray,
+    x0: int,
+    y0: int,
+):
+    """Removes the signal of a station where obstacles block its coverage
+
+    Args:
+        power (np.ndarray): received power over a window with origin (x0, y0)
+        mask (np.ndarray): obstacle-aware mask shaped like `bts.coverage`
+    """
+    blocked = bts.coverage(grid) & ~mask
+    h, w = blocked.shape
+    by0, bx0 = bts.y - h // 2, bts.x - w // 2
+    ys = slice(max(y0, by0), min(y0 + power.shape[0], by0 + h))
+    xs = slice(max(x0, bx0), min(x0 + power.shape[1], bx0 + w))
+    if ys.start >= ys.stop or xs.start >= xs.stop:
+        return
+    blocked = blocked[ys.start - by0 : ys.stop - by0, xs.start - bx0 : xs.stop - bx0]
+    power[ys.start - y0 : ys.stop - y0, xs.start - x0 : xs.stop - x0][blocked] = -np.inf
+
+
+def server_maps(
+    base_stations: Sequence[BaseStation],
+    width: int,
+    height: int,
+    grid: Grid = DEFAULT_GRID,
+    noise: float = NOISE_FLOOR,
+    window: Optional[tuple[int, int, int, int]] = None,
+    masks: Optional[Sequence[Optional[np.ndarray]]] = None,
+) -> ServerMaps:
+    """Calculates best-server, RSRP and SINR maps of an area
+
+    Args:
+        base_stations (Sequence[BaseStation]): transmitting base stations
+        width (int), height (int): size of the simulation area in cells
+        grid (Grid, optional): calculation grid. Defaults to `DEFAULT_GRID`.
+        noise (float, optional): receiver noise power in dBm
+        window (tuple[int, int, int, int], optional): part (x0, y0, x1, y1) of
+        the area to evaluate, e.g. a tile. Defaults to the whole area.
+        masks (Sequence[np.ndarray | None], optional): obstacle-aware coverage
+        masks of the stations, e.g. `BaseStation.reachable_map`. Cells within
+        the free-space coverage of a station but outside its mask get no
+        signal from it. Defaults to free space everywhere.
+
+    Returns:
+        ServerMaps: quantized maps of the window
+    """
+    x0, y0, x1, y1 = window or (0, 0, width, height)
+    shape = (y1 - y0, x1 - x0)
+    best = np.full(shape, -np.inf)
+    server = np.full(shape, -1, np.int16)
+    total = np.zeros(shape)  # mW
+    half = grid.half
+    # index -1 of cells without a server picks the trailing inf
+    sensitivity = np.array([b.sensitivity for b in base_stations] + [np.inf])
+
+    for i, bts in enumerate(base_stations):
+        # signal level minus this gives the received power in dBm
+        offset = bts.threshold - bts.sensitivity
+        # contributions far below the noise don't change the SINR
+        r = reach(bts, grid, noise - INTERFERENCE_MARGIN + offset)
+        if r < 0:
+            continue
+        # part of the window within reach, inside the -half..half-1 window
+        wy0, wy1 = max(y0, bts.y - min(r, half)), min(y1, bts.y + min(r, half - 1) + 1)
+        wx0, wx1 = max(x0, bts.x - min(r, half)), min(x1, bts.x + min(r, half - 1) + 1)
+        if wy0 >= wy1 or wx0 >= wx1:
+            continue
+        dy = np.arange(wy0, wy1)[:, None] - bts.y
+        dx = np.arange(wx0, wx1)[None, :] - bts.x
+        power = multires.signal_level(
+            dy,
+            dx,
+            bts.power,
+            bts.height - RECV_HEIGHT,
+            bts.angle,
+            bts.tilt,
+            bts.pattern,
+            grid.cell_size,
+            grid.angle_step,
+            bts.model,
+            bts.frequency,
+            bts.height,
+        )
+        power -= offset
+        if masks is not None and masks[i] is not None:
+            _block(power, bts, grid, masks[i], wx0, wy0)
+        win = (slice(wy0 - y0, wy1 - y0), slice(wx0 - x0, wx1 - x0))
+        total[win] += 10 ** (power / 10)
+        better = power > best[win]
+        best[win] = np.where(better, power, best[win])
+        server[win] = np.where(better, i, server[win])
+
+    # each cell has to exceed the sensitivity of its own server
+    covered = best > sensitivity[server]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interference = np.maximum(total - 10 ** (best / 10), 0)
+        sinr = best - 10 * np.log10(interference + 10 ** (noise / 10))
+    server[~covered] = -1
+    return ServerMaps(
+        server, _quantize(best, covered), _quantize(sinr, covered), (x0, y0)
+    )
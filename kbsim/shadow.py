@@ -0,0 +1,219 @@
+"""Obstacle shadows via a polar transform.
+
+The obstacle raster around a base station is resampled on a polar grid with
+one ray per pixel of the outermost ring. A running OR along each ray marks
+everything behind the first obstacle, and the polar result is gathered back
+to the cartesian window of the coverage mask. Unlike `los.line_of_sight` this
+is an approximation along pixel-wide rays, but it is computed once per
+BTS/obstacle change and turns every UE check into a single lookup.
+
+`loss_map` generalizes the running OR to a running sum of the penetration
+loss of every obstacle a ray enters, optionally capped by the loss of single
+knife-edge diffraction over the dominant obstacle.
+"""
+
+from functools import lru_cache
+from typing import Optional
+import numpy as np
+
+GRID_STEP = 128
+"""Window sizes are rounded up to a multiple of this to share polar grids"""
+
+
+@lru_cache(maxsize=4)
+def _polar_grid(size: int):
+    """Polar sampling geometry of a square window centered on `size // 2`
+
+    Returns:
+        (dx, dy, theta_idx, r_idx): sample offsets (n_theta, n_r) of the polar
+        grid and the polar index of every window pixel
+    """
+    half = size // 2
+    n_r = int(np.ceil(np.hypot(half, half))) + 1
+    n_theta = max(8, int(np.ceil(2 * np.pi * n_r)))
+    theta = np.linspace(0, 2 * np.pi, n_theta, endpoint=False, dtype=np.float32)
+    r = np.arange(n_r, dtype=np.float32)
+    dx = np.round(np.cos(theta)[:, None] * r).astype(np.int32)
+    dy = np.round(np.sin(theta)[:, None] * r).astype(np.int32)
+
+    wy, wx = np.ogrid[-half : size - half, -half : size - half]
+    r_idx = np.round(np.hypot(wx, wy)).astype(np.int16)
+    theta_idx = np.round(np.arctan2(wy, wx) * (n_theta / (2 * np.pi))) % n_theta
+    theta_idx = theta_idx.astype(np.int16)
+    for arr in (dx, dy, r_idx, theta_idx):
+        arr.flags.writeable = False
+    return dx, dy, theta_idx, r_idx
+
+
+def _polar(
+    raster: np.ndarray, center: tuple[int, int], shape: tuple[int, int]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Samples a raster along the rays of the polar grid around `center`
+
+    Returns:
+        (polar, theta_idx, r_idx): (n_theta, n_r) samples, zero outside of the
+        raster, and the polar index of every pixel of the window
+    """
+    size = -(-max(shape) // GRID_STEP) * GRID_STEP
+    dx, dy, theta_idx, r_idx = _polar_grid(size)
+    # crop the canonical window and the rays to the requested window
+    rows = slice(size // 2 - shape[0] // 2, size // 2 - shape[0] // 2 + shape[0])
+    cols = slice(size // 2 - shape[1] // 2, size // 2 - shape[1] // 2 + shape[1])
+    theta_idx, r_idx = theta_idx[rows, cols], r_idx[rows, cols]
+    n_r = int(r_idx.max()) + 1
+    # samples outside the area are clipped onto a free border
+    h, w = raster.shape
+    padded = np.pad(raster, 1)
+    x = np.clip(center[0] + dx[:, :n_r], -1, w)
+    x += 1
+    idx = np.clip(center[1] + dy[:, :n_r], -1, h)
+    idx += 1
+    idx *= w + 2
+    idx += x
+    return np.take(padded.ravel(), idx), theta_idx, r_idx
+
+
+def shadow_map(
+    obstacle_map: np.ndarray, center: tuple[int, int], shape: tuple[int, int]
+) -> np.ndarray:
+    """Calculates which pixels around a point are hidden behind obstacles
+
+    Args:
+        obstacle_map (np.ndarray): mask with ones set where obstacles are present
+        center (tuple[int, int]): position (x, y) of the signal source
+        shape (tuple[int, int]): window shape, e.g. of the coverage mask
+
+    Returns:
+        np.ndarray: boolean window of `shape` centered on `center`,
+        True where the line of sight is blocked
+    """
+    polar, theta_idx, r_idx = _polar(
+        obstacle_map.astype(bool, copy=False), center, shape
+    )
+    # a pixel is shadowed by obstacles strictly closer to the source
+    blocked = np.logical_or.accumulate(polar, axis=1)
+    shadowed = np.zeros_like(blocked)
+    shadowed[:, 1:] = blocked[:, :-1]
+    return shadowed[theta_idx, r_idx]
+
+
+def reachable_map(
+    signal_map: np.ndarray, obstacle_map: np.ndarray, center: tuple[int, int]
+) -> np.ndarray:
+    """Masks a free-space coverage mask with obstacle shadows
+
+    Args:
+        signal_map (np.ndarray): coverage mask centered on the base station
+        obstacle_map (np.ndarray): mask with ones set where obstacles are present
+        center (tuple[int, int]): base station position (x, y)
+
+    Returns:
+        np.ndarray: mask of the same shape as `signal_map`
+    """
+    if not signal_map.any():
+        return signal_map
+    return signal_map & ~shadow_map(obstacle_map, center, signal_map.shape)
+
+
+def knife_edge_loss(v: np.ndarray) -> np.ndarray:
+    """ITU-R P.526 approximation of the knife-edge loss J(v) in dB"""
+    v = np.asarray(v, np.float64)
+    with np.errstate(invalid="ignore", over="ignore"):
+        loss = 6.9 + 20 * np.log10(np.sqrt((v - 0.1) ** 2 + 1) + v - 0.1)
+    return np.where(v > -0.78, loss, 0.0)
+
+
+def _diffraction(
+    heights: np.ndarray,
+    bts_height: float,
+    ue_height: float,
+    cell_size: float,
+    frequency: float,
+) -> np.ndarray:
+    """Knife-edge loss along polar rays over the obstacle seen steepest from the BTS
+
+    Args:
+        heights (np.ndarray): (n_theta, n_r) float32 obstacle heights in m, 0
+        where free
+
+    Returns:
+        np.ndarray: (n_theta, n_r) float32 loss in dB, 0 without an edge
+    """
+    n_r = heights.shape[1]
+    d = np.arange(n_r, dtype=np.float32) * np.float32(cell_size * 1000)  # m
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = (heights - np.float32(bts_height)) / d
+    slope[heights <= 0] = -np.inf
+    slope[:, 0] = -np.inf  # an obstacle at the BTS doesn't diffract
+    # index of the steepest edge up to each sample, 0 where there is none
+    steepest = np.maximum.accumulate(slope, axis=1)
+    found = slope >= steepest
+    found &= slope > -np.inf
+    edge = np.where(found, np.arange(n_r, dtype=np.int32), np.int32(0))
+    np.maximum.accumulate(edge, axis=1, out=edge)
+    # the receiver at sample r only sees edges strictly closer to the BTS
+    edge[:, 1:] = edge[:, :-1].copy()
+    edge[:, 0] = 0
+    rays, samples = np.nonzero(edge)
+    edge = edge[rays, samples]
+    d1, d_r = d[edge], d[samples]
+    # height of the edge above the direct ray to the receiver
+    clearance = heights[rays, edge] - (bts_height + (ue_height - bts_height) * d1 / d_r)
+    wavelength = 299.792458 / frequency  # m
+    v = clearance * np.sqrt(2 * d_r / (wavelength * d1 * (d_r - d1)))
+    loss = np.zeros(heights.shape, np.float32)
+    loss[rays, samples] = knife_edge_loss(v)
+    return loss
+
+
+def loss_map(
+    attenuation: np.ndarray,
+    center: tuple[int, int],
+    shape: tuple[int, int],
+    heights: Optional[np.ndarray] = None,
+    bts_height: float = 20.0,
+    ue_height: float = 1.5,
+    cell_size: float = 1.0,
+    frequency: float = 900.0,
+) -> np.ndarray:
+    """Calculates the obstacle loss around a point
+
+    Every obstacle a ray enters adds its attenuation once, regardless of its
+    thickness, so a ray through two walls loses both of them. With `heights`
+    the signal may also bend over the obstacle seen steepest from the source,
+    and the smaller of the two losses is kept.
+
+    Args:
+        attenuation (np.ndarray): (height, width) penetration loss in dB of the
+        obstacle covering each pixel, 0 where free and inf where opaque
+        center (tuple[int, int]): position (x, y) of the signal source
+        shape (tuple[int, int]): window shape, e.g. of the coverage mask
+        heights (np.ndarray, optional): (height, width) obstacle heights in m,
+        enables knife-edge diffraction. Defaults to None.
+        bts_height (float), ue_height (float): antenna heights in m
+        cell_size (float): size of a grid cell in km
+        frequency (float): carrier frequency in MHz
+
+    Returns:
+        np.ndarray: float32 window of `shape` centered on `center`, loss in dB
+        of the path to every pixel, inf where no signal gets through
+    """
+    polar, theta_idx, r_idx = _polar(
+        attenuation.astype(np.float32, copy=False), center, shape
+    )
+    # penetration loss is counted where a ray enters an obstacle
+    previous = np.zeros_like(polar)
+    previous[:, 1:] = polar[:, :-1]
+    entered = np.where((polar > 0) & (polar != previous), polar, np.float32(0))
+    # a pixel is attenuated by obstacles strictly closer to the source
+    loss = np.zeros_like(polar)
+    np.cumsum(entered[:, :-1], axis=1, out=loss[:, 1:])
+    if heights is not None:
+        polar_heights, _, _ = _polar(
+            heights.astype(np.float32, copy=False), center, shape
+        )
+        diffraction = _diffraction(
+            polar_heights, bts_height, ue_height, cell_size, frequency
+        )
+        np.minimum(loss, diffraction, out=loss)
+    return loss[theta_idx, r_idx]
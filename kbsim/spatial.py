@@ -0,0 +1,78 @@
+"""Uniform-grid spatial index of points for hit-testing and radius queries.
+
+Points are bucketed by the grid cell they fall into, so inserting, moving or
+removing one is O(1) and a query only visits the cells overlapping its circle.
+"""
+
+from collections.abc import Hashable, Iterator
+from typing import Optional
+import math
+
+Cell = tuple[int, int]
+
+
+class SpatialIndex:
+    """Points keyed by arbitrary hashable objects
+
+    Args:
+        cell (float, optional): size of a grid cell, about the typical query
+        radius. Defaults to 32.
+    """
+
+    def __init__(self, cell: float = 32) -> None:
+        self.cell = cell
+        self._cells: dict[Cell, dict[Hashable, tuple[float, float]]] = {}
+        self._where: dict[Hashable, Cell] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def _cell(self, x: float, y: float) -> Cell:
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def update(self, key: Hashable, x: float, y: float):
+        """Adds a point or moves an already added one"""
+        cell = self._cell(x, y)
+        old = self._where.get(key)
+        if old is not None and old != cell:
+            self._remove_from(old, key)
+        self._cells.setdefault(cell, {})[key] = (x, y)
+        self._where[key] = cell
+
+    def discard(self, key: Hashable):
+        """Removes a point, does nothing if it wasn't added"""
+        cell = self._where.pop(key, None)
+        if cell is not None:
+            self._remove_from(cell, key)
+
+    def _remove_from(self, cell: Cell, key: Hashable):
+        bucket = self._cells[cell]
+        del bucket[key]
+        if not bucket:
+            del self._cells[cell]
+
+    def within(
+        self, x: float, y: float, radius: float
+    ) -> Iterator[tuple[float, Hashable]]:
+        """Yields (distance, key) of the points at most `radius` away"""
+        (cx0, cy0), (cx1, cy1) = (
+            self._cell(x - radius, y - radius),
+            self._cell(x + radius, y + radius),
+        )
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for key, (px, py) in self._cells.get((cx, cy), {}).items():
+                    d = math.hypot(px - x, py - y)
+                    if d <= radius:
+                        yield d, key
+
+    def nearest(self, x: float, y: float, radius: float) -> Optional[Hashable]:
+        """Closest point at most `radius` away, None if there is none"""
+        best, best_d = None, math.inf
+        for d, key in self.within(x, y, radius):
+            if d < best_d:
+                best, best_d = key, d
+        return best
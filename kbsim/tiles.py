@@ -0,0 +1,248 @@
+"""Tiled computation of area-wide rasters backed by memory-mapped files.
+
+City-scale areas don't fit in memory as single arrays, so the area is split
+into square tiles which are computed one at a time and streamed into
+`np.memmap` files. Peak memory depends on the tile size only. A base station
+only influences the tiles within its reach, so moving or editing it only
+needs those tiles recomputed.
+"""
+
+from collections.abc import Iterable, Sequence
+from typing import Optional
+import pathlib as pl
+import numpy as np
+from . import multires
+from .engine import DEFAULT_GRID, RECV_HEIGHT, BaseStation, Obstacle
+from .geometry import Grid
+from .raster import stamp_window
+
+Tile = tuple[int, int]
+"""Tile index (row, column)"""
+
+
+class TileStore:
+    """(height, width) raster in a memory-mapped file, addressed by tiles
+
+    The file is in `.npy` format, so its shape and dtype are stored with the
+    data. An existing file is reused only if both match, otherwise it is
+    recreated with zeros.
+    """
+
+    def __init__(
+        self,
+        path: pl.Path,
+        shape: tuple[int, int],
+        dtype: np.dtype,
+        tile: int = 1024,
+    ) -> None:
+        self.path = pl.Path(path)
+        self.tile = tile
+        self.array = _open(self.path, tuple(shape), np.dtype(dtype))
+        self.n_tiles = (-(-shape[0] // tile), -(-shape[1] // tile))
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.array.shape
+
+    def window(self, tile: Tile) -> tuple[slice, slice]:
+        """Slices of the raster covered by a tile"""
+        ty, tx = tile
+        return (
+            slice(ty * self.tile, min((ty + 1) * self.tile, self.shape[0])),
+            slice(tx * self.tile, min((tx + 1) * self.tile, self.shape[1])),
+        )
+
+    def __iter__(self):
+        for ty in range(self.n_tiles[0]):
+            for tx in range(self.n_tiles[1]):
+                yield ty, tx
+
+    def overlapping(self, x0: int, y0: int, x1: int, y1: int) -> list[Tile]:
+        """Tiles intersecting the inclusive box [x0, x1] x [y0, y1]"""
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.shape[1] - 1), min(y1, self.shape[0] - 1)
+        if x0 > x1 or y0 > y1:
+            return []
+        return [
+            (ty, tx)
+            for ty in range(y0 // self.tile, y1 // self.tile + 1)
+            for tx in range(x0 // self.tile, x1 // self.tile + 1)
+        ]
+
+    def flush(self):
+        self.array.flush()
+
+
+def _open(path: pl.Path, shape: tuple[int, int], dtype: np.dtype) -> np.memmap:
+    if path.exists():
+        try:
+            array = np.lib.format.open_memmap(path, mode="r+")
+            if array.shape == shape and array.dtype == dtype:
+                return array
+            del array  # stale raster of another area, close it before replacing
+        except (OSError, ValueError):
+            pass  # not an .npy file, e.g. of an older version
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def reach(
+    bts: BaseStation, grid: Grid = DEFAULT_GRID, threshold: Optional[float] = None
+) -> int:
+    """Radius in cells beyond which the BTS can't cover anything
+
+    Bounded by the best possible antenna gain and by the calculation window,
+    see `multires.reach`. Returns -1 if the BTS covers nothing at all.
+
+    Args:
+        threshold (float, optional): signal level that counts as coverage.
+        Defaults to `bts.threshold`.
+    """
+    if threshold is None:
+        threshold = bts.threshold
+    return multires.reach(
+        bts.power,
+        bts.pattern,
+        threshold,
+        grid.half,
+        grid.cell_size,
+        bts.model,
+        bts.frequency,
+        bts.height,
+        bts.height - RECV_HEIGHT,
+    )
+
+
+class TiledCoverage:
+    """Coverage of a large area streamed tile by tile into memory-mapped files
+
+    Files in `directory`, in `.npy` format despite the suffixes:
+        level.f32: best signal level over all base stations, compare with
+        `RECV_MAGIC` when they use the default radio parameters
+        covered.u8: 1 where some base station covers the cell
+        obstacles.u8: 1 where an obstacle is present
+    """
+
+    def __init__(
+        self,
+        directory: pl.Path,
+        width: int,
+        height: int,
+        grid: Grid = DEFAULT_GRID,
+        tile: int = 1024,
+    ) -> None:
+        directory = pl.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        shape = (height, width)
+        self.grid = grid
+        self.level = TileStore(directory / "level.f32", shape, np.float32, tile)
+        self.covered = TileStore(directory / "covered.u8", shape, np.uint8, tile)
+        self.obstacles = TileStore(directory / "obstacles.u8", shape, np.uint8, tile)
+
+    def station_tiles(self, bts: BaseStation) -> list[Tile]:
+        """Tiles the base station can influence"""
+        r = reach(bts, self.grid)
+        if r < 0:
+            return []
+        lo, hi = min(r, self.grid.half), min(r, self.grid.half - 1)
+        return self.level.overlapping(bts.x - lo, bts.y - lo, bts.x + hi, bts.y + hi)
+
+    def invalidated(self, *stations: BaseStation) -> set[Tile]:
+        """Tiles to recompute after the given BTS states were added or removed
+
+        Pass both the old and the new state of an edited or moved BTS.
+        """
+        return {t for bts in stations for t in self.station_tiles(bts)}
+
+    def render_coverage(
+        self,
+        base_stations: Sequence[BaseStation],
+        tiles: Optional[Iterable[Tile]] = None,
+    ):
+        """Computes the coverage of the given tiles (all by default)
+
+        Args:
+            base_stations (Sequence[BaseStation]): all base stations of the area
+            tiles (Iterable[Tile], optional): tiles to recompute
+        """
+        grid, half = self.grid, self.grid.half
+        reaches = np.array([reach(b, grid) for b in base_stations], np.int64)
+        # the calculation window spans offsets -half..half-1
+        lo, hi = np.minimum(reaches, half), np.minimum(reaches, half - 1)
+        xy = np.array([(b.x, b.y) for b in base_stations], np.int64).reshape(-1, 2)
+        for tile in self.level if tiles is None else tiles:
+            rows, cols = self.level.window(tile)
+            shape = (rows.stop - rows.start, cols.stop - cols.start)
+            best = np.full(shape, -np.inf, np.float32)
+            covered = np.zeros(shape, "bool")
+            # BTS whose reach box intersects the tile
+            near = (
+                (reaches >= 0)
+                & (xy[:, 0] + hi >= cols.start)
+                & (xy[:, 0] - lo < cols.stop)
+                & (xy[:, 1] + hi >= rows.start)
+                & (xy[:, 1] - lo < rows.stop)
+            )
+            for i in np.flatnonzero(near):
+                bts = base_stations[i]
+                # part of the tile within the reach of the BTS
+                y0 = max(rows.start, bts.y - lo[i])
+                y1 = min(rows.stop, bts.y + hi[i] + 1)
+                x0 = max(cols.start, bts.x - lo[i])
+                x1 = min(cols.stop, bts.x + hi[i] + 1)
+                dy = np.arange(y0, y1)[:, None] - bts.y
+                dx = np.arange(x0, x1)[None, :] - bts.x
+                level = multires.signal_level(
+                    dy,
+                    dx,
+                    bts.power,
+                    bts.height - RECV_HEIGHT,
+                    bts.angle,
+                    bts.tilt,
+                    bts.pattern,
+                    grid.cell_size,
+                    grid.angle_step,
+                    bts.model,
+                    bts.frequency,
+                    bts.height,
+                )
+                window = (
+                    slice(y0 - rows.start, y1 - rows.start),
+                    slice(x0 - cols.start, x1 - cols.start),
+                )
+                np.maximum(best[window], level, out=best[window])
+                # threshold before rounding to float32
+                covered[window] |= level > bts.threshold
+            self.level.array[rows, cols] = best
+            self.covered.array[rows, cols] = covered
+
+    def render_obstacles(
+        self, obstacles: Sequence[Obstacle], tiles: Optional[Iterable[Tile]] = None
+    ):
+        """Rasterizes obstacles into the given tiles (all by default)"""
+        ob = np.array([(o.x, o.y, o.size) for o in obstacles], np.int64).reshape(-1, 3)
+        for tile in self.obstacles if tiles is None else tiles:
+            rows, cols = self.obstacles.window(tile)
+            out = np.zeros((rows.stop - rows.start, cols.stop - cols.start), "bool")
+            near = (
+                (ob[:, 0] + ob[:, 2] >= cols.start)
+                & (ob[:, 0] - ob[:, 2] < cols.stop)
+                & (ob[:, 1] + ob[:, 2] >= rows.start)
+                & (ob[:, 1] - ob[:, 2] < rows.stop)
+            )
+            for x, y, size in ob[near]:
+                window, stamp = stamp_window(
+                    out.shape, x - cols.start, y - rows.start, size
+                )
+                out[window] |= stamp
+            self.obstacles.array[rows, cols] = out
+
+    def obstacle_tiles(self, obstacle: Obstacle) -> list[Tile]:
+        """Tiles covered by an obstacle"""
+        s = obstacle.size
+        return self.obstacles.overlapping(
+            obstacle.x - s, obstacle.y - s, obstacle.x + s, obstacle.y + s
+        )
+
+    def flush(self):
+        for store in (self.level, self.covered, self.obstacles):
+            store.flush()
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, simpledialog
-from typing import Type, Optional, TextIO
+from typing import Callable, Hashable, Type, Optional, TextIO
+from collections import OrderedDict
 from functools import partial
 import numpy as np
 from PIL import Image, ImageFilter
@@ -8,34 +9,15 @@ from PIL.ImageTk import PhotoImage
 import matplotlib.pyplot as plt
 import io
 import pathlib as pl
-from patterns import HALF_WAVE_DIPOLE, pattern_from_msi_file
-
-FREQ = 900  # MHz
-RECV_SENSITIVITY = -90  # dBm
-RECV_HEIGHT = 1.5  # m
-GRID_SIZE = 1  # km
-
-# Friis equation:
-# P_r = P_t + G_t + G_r + L_f
-# assume isotropic receiver antenna
-# P_r = P_t + G_t - 32.5 - 20 * log10(f) - 20 * log10(d)
-# we can use distance squared to ommit square root
-# P_r = P_t + G_t - 32.5 - 20 * log10(f) - 10 * log10(d**2)
-# UE has signal if P_r > RECV_SENSITIVITY:
-# P_t + G_t - 10 * log10(d**2) > RECV_SENSITIVITY + 32.5 + 20 * log10(f)
-# P_t + G_t - 10 * log10(d**2) > RECV_MAGIC
-
-RECV_MAGIC = RECV_SENSITIVITY + 32.5 + 20 * np.log10(FREQ)
-
-# def get_signal_map(dista)
-SIM_SIZE = (1000, 700)
-CALC_SIZE = float(max(SIM_SIZE) // 2)
-X, Y = np.ogrid[-CALC_SIZE:CALC_SIZE, -CALC_SIZE:CALC_SIZE]
-X *= GRID_SIZE
-Y *= GRID_SIZE
-DISTANCE = X**2 + Y**2
-DISTANCE_SQRT = np.sqrt(DISTANCE)
-AZIMUTH = np.rad2deg(np.arctan2(X, Y)).astype(int)
+import patterns
+from patterns import DIPOLE_ID, PatternLibrary, pattern_gain
+import kbsim
+from kbsim import SIM_SIZE, calc_signal_map, check_signal
+
+PATTERNS = PatternLibrary()
+"""Antenna patterns referenced by the base stations"""
+MODELS: dict[str, kbsim.PathLossModel] = dict(kbsim.MODELS)
+"""Path-loss models of the GUI, `kbsim.MODELS` and custom ones of loaded files"""
 
 
 def center_Toplevel(top: tk.Toplevel):
@@ -57,9 +39,59 @@ def center_Toplevel(top: tk.Toplevel):
     top.minsize(top.winfo_reqwidth(), top.winfo_reqheight())
 
 
+class render_scheduler:
+    """Coalesces canvas updates and flushes them once per frame
+
+    Updates are keyed by (owner, kind), a newer update of the same key replaces
+    the pending one, so a burst of events costs a single redraw.
+    """
+
+    frame_ms: int = 16
+
+    def __init__(self, widget: tk.Misc) -> None:
+        self.widget = widget
+        self._pending: dict[Hashable, Callable[[], None]] = {}
+        self._job: str = None
+
+    def schedule(self, key: tuple[Hashable, str], update: Callable[[], None]):
+        self._pending[key] = update
+        if self._job is None:
+            self._job = self.widget.after(self.frame_ms, self.flush)
+
+    def cancel(self, owner: Hashable):
+        """Drops pending updates of a deleted object"""
+        for key in [k for k in self._pending if k[0] is owner]:
+            del self._pending[key]
+
+    def flush(self):
+        self._job = None
+        pending, self._pending = self._pending, {}
+        for update in pending.values():
+            update()
+
+
+OUTLINE_CACHE_SIZE = 64
+_outlines: OrderedDict[str, PhotoImage] = OrderedDict()
+
+
+def coverage_outline(mask: np.ndarray) -> PhotoImage:
+    """Outline image of a coverage mask, shared by identical masks"""
+    key = kbsim.array_hash(mask)
+    if key in _outlines:
+        _outlines.move_to_end(key)
+        return _outlines[key]
+    img = Image.fromarray(mask).filter(ImageFilter.FIND_EDGES).convert("P")
+    img.putpalette([0, 0, 0, 0, 0, 255, 0, 255] * 128, rawmode="RGBA")
+    _outlines[key] = PhotoImage(img)
+    if len(_outlines) > OUTLINE_CACHE_SIZE:
+        _outlines.popitem(last=False)
+    return _outlines[key]
+
+
 class app_object:
     x: int = 10
     y: int = 10
+    size: int = 4
     canvas: tk.Canvas
     id: int = None
     outline_id: int = None
@@ -133,6 +165,7 @@ class app_object:
         return window
 
     def delete(self):
+        self.canvas.scheduler.cancel(self)
         self.deselect()
         self.canvas.delete(self.id)
 
@@ -148,11 +181,16 @@ class app_object:
         self.outline_id = None
 
     def drag(self, event: tk.Event):
-        self.set_position(event.x, event.y)
+        self.canvas.scheduler.schedule(
+            (self, "position"), partial(self.set_position, event.x, event.y)
+        )
+
+    def moved(self):
+        if hasattr(self, "on_move"):
+            self.on_move(self)
 
     def draw(self, canvas: tk.Canvas) -> int:
         self.canvas = canvas
-        self.size = 4
         return self.make_movable(
             canvas.create_oval(
                 self.x - self.size,
@@ -186,6 +224,7 @@ class app_object:
         )
         if self.outline_id:
             self.canvas.coords(self.outline_id, *self.canvas.bbox(self.id))
+        self.moved()
 
     def __str__(self):
         return self.name
@@ -203,15 +242,16 @@ class UE(app_object):
         self.canvas.coords(self.id, self.x, self.y)
         if self.outline_id:
             self.canvas.coords(self.outline_id, *self.canvas.bbox(self.id))
+        self.moved()
 
+    def to_engine(self) -> kbsim.UserEquipment:
+        return kbsim.UserEquipment(self.name, self.x, self.y)
 
-def get_cropped_matrix(mat):
-    idx = np.where(mat)
-    if not idx[0].size:
-        return np.zeros((3, 3), "bool")
-    p = np.array(mat.shape) // 2
-    mx, my = (max(abs(p[i] - idx[i].min()), abs(idx[i].max() - p[i])) for i in range(2))
-    return mat[p[0] - mx : p[0] + mx + 1, p[1] - my : p[1] + my + 1]
+    @classmethod
+    def from_engine(cls, ue: kbsim.UserEquipment) -> "UE":
+        obj = cls(ue.name)
+        obj.x, obj.y = ue.x, ue.y
+        return obj
 
 
 def reorganize_array(arr):
@@ -236,33 +276,87 @@ def compare_entry_value(entry, value):
         return False
 
 
+def pattern_id(pattern: np.ndarray, name: Optional[str] = None) -> str:
+    """ID of a pattern in `PATTERNS`, adding it under `name` if it's new"""
+    known = PATTERNS.id_of(pattern)
+    if known is not None:
+        return known
+    name = name or "pattern"
+    if name in PATTERNS:  # a different pattern of the same name
+        name = f"{name} ({kbsim.array_hash(pattern)[:8]})"
+    PATTERNS.add(name, pattern)
+    return name
+
+
+def model_name(model: kbsim.PathLossModel) -> str:
+    """Key of a model in `MODELS`, adding it if it has custom parameters"""
+    for name, known in MODELS.items():
+        if known == model:
+            return name
+    MODELS[repr(model)] = model
+    return repr(model)
+
+
 class BTS(app_object):
     def __init__(self, name) -> None:
         super().__init__(name)
-        self.radiation_pattern = HALF_WAVE_DIPOLE
-        self.antenna_name = tk.StringVar(value="half-wave dipole")
+        self.set_pattern(DIPOLE_ID)
+
+    @classmethod
+    def from_engine(
+        cls, bts: kbsim.BaseStation, pattern_name: Optional[str] = None
+    ) -> "BTS":
+        obj = cls(bts.name)
+        obj.x, obj.y = bts.x, bts.y
+        for param in obj._editable:
+            # keep the types the edit dialog parses with
+            setattr(obj, param, type(getattr(obj, param))(getattr(bts, param)))
+        obj.model_name = model_name(bts.model)
+        # the mask is usually already in the cache, see `kbsim.load_scenario`
+        obj.set_pattern(pattern_id(bts.pattern, pattern_name))
+        return obj
 
-    _radiation_pattern: np.ndarray
+    pattern_id: str = DIPOLE_ID
+    """ID of the antenna pattern in `PATTERNS`"""
 
     @property
-    def radiation_pattern(self):
-        return self._radiation_pattern
+    def radiation_pattern(self) -> np.ndarray:
+        return PATTERNS[self.pattern_id]
 
-    @radiation_pattern.setter
-    def radiation_pattern(self, value):
-        self._radiation_pattern = value
-        self.calc_signal_map()
+    def set_pattern(self, pattern_id: str):
+        """Switches to another pattern, keeping the current one if it fails to load
+
+        A file that can't be parsed is removed from `PATTERNS`.
+        """
+        try:
+            pattern = PATTERNS[pattern_id]  # files are parsed on first use
+        except Exception:
+            if pattern_id in PATTERNS.files:
+                PATTERNS.remove(pattern_id)
+            raise
+        self.calc_signal_map(pattern)
+        self.pattern_id = pattern_id
 
     _signal_map: np.ndarray
 
-    def calc_signal_map(self):
-        tmp = self.power - 10 * np.log10(DISTANCE + (self.height - RECV_HEIGHT) ** 2)
-        elevation = np.arctan2(DISTANCE_SQRT, (self.height - RECV_HEIGHT)).astype(int)
-        tmp += (
-            self.radiation_pattern[0, ((AZIMUTH + self.angle) % 360)]
-            + self.radiation_pattern[1, ((elevation + self.tilt) % 360)]
+    model_name: str = "free space"
+    """Path-loss model, a key of `MODELS`"""
+
+    @property
+    def model(self) -> kbsim.PathLossModel:
+        return MODELS[self.model_name]
+
+    def calc_signal_map(self, pattern: Optional[np.ndarray] = None):
+        self.signal_map = calc_signal_map(
+            self.power,
+            self.height,
+            self.angle,
+            self.tilt,
+            self.radiation_pattern if pattern is None else pattern,
+            model=self.model,
+            frequency=self.frequency,
+            sensitivity=self.sensitivity,
         )
-        self.signal_map = get_cropped_matrix(tmp > RECV_MAGIC)
 
     @property
     def signal_map(self):
@@ -271,21 +365,27 @@ class BTS(app_object):
     @signal_map.setter
     def signal_map(self, value):
         self._signal_map = value
+        self.reachable_map = None
+        self.plot_signal()
+
+    reachable_map: np.ndarray = None
+    """Coverage with obstacle shadows, valid until the BTS or obstacles change"""
+
+    def set_reachable_map(self, value: np.ndarray):
+        self.reachable_map = value
         self.plot_signal()
 
     sig_plot_id: int = None
     img: PhotoImage = None
 
     def plot_signal(self):
-        if not self.id:
-            return
-        img = (
-            Image.fromarray(self._signal_map)
-            .filter(ImageFilter.FIND_EDGES)
-            .convert("P")
+        if self.id:
+            self.canvas.scheduler.schedule((self, "signal"), self._plot_signal)
+
+    def _plot_signal(self):
+        self.img = coverage_outline(
+            self._signal_map if self.reachable_map is None else self.reachable_map
         )
-        img.putpalette([0, 0, 0, 0, 0, 255, 0, 255] * 128, rawmode="RGBA")
-        self.img = PhotoImage(img)
         if self.sig_plot_id:
             self.canvas.itemconfig(self.sig_plot_id, image=self.img)
         else:
@@ -296,7 +396,16 @@ class BTS(app_object):
     height: float = 20.0
     angle: int = 0
     tilt: int = 0
-    _editable: list[str] = ["power", "height", "angle", "tilt"]
+    frequency: float = float(kbsim.FREQ)  # MHz
+    sensitivity: float = float(kbsim.RECV_SENSITIVITY)  # dBm
+    _editable: list[str] = [
+        "power",
+        "height",
+        "angle",
+        "tilt",
+        "frequency",
+        "sensitivity",
+    ]
 
     def check_signal(self, obstacle_map: np.ndarray, ue: UE) -> bool:
         """Checks wheter the UEs' signal is good enough for transmission
@@ -307,30 +416,26 @@ class BTS(app_object):
         Returns:
             bool: True if UE has signal from this BTS
         """
-        d = [ue.x - self.x, ue.y - self.y]
-        s = self.signal_map.shape
-        if (
-            abs(d[0]) > s[1] / 2
-            or abs(d[1]) > s[0] / 2
-            or (
-                not self.signal_map[
-                    (d[1] + s[0] // 2) % s[0], (d[0] + s[1] // 2) % s[1]
-                ]
-            )
-        ):
-            return False
+        return check_signal(
+            self.signal_map, obstacle_map, (self.x, self.y), (ue.x, ue.y)
+        )
 
-        if abs(d[1]) > abs(d[0]):  # more range over y
-            a = d[0] / d[1]
-            for y in range(self.y, ue.y, -1 if self.y > ue.y else 1):
-                if obstacle_map[round(self.x + (y - self.y) * a), y]:
-                    return False
-        else:
-            a = d[1] / d[0]
-            for x in range(self.x, ue.x, -1 if self.x > ue.x else 1):
-                if obstacle_map[x, round(self.y + a * (x - self.x))]:
-                    return False
-        return True
+    def to_engine(self) -> kbsim.BaseStation:
+        return kbsim.BaseStation(
+            self.name,
+            self.x,
+            self.y,
+            self.power,
+            self.height,
+            self.angle,
+            self.tilt,
+            self.frequency,
+            self.sensitivity,
+            self.model,
+            self.radiation_pattern,
+            self.signal_map,
+            self.reachable_map,
+        )
 
     def draw(self, canvas: tk.Canvas) -> int:
         from icons import BTS_ICON as icon
@@ -348,9 +453,13 @@ class BTS(app_object):
     def set_position(self, x: int, y: int):
         self.x, self.y = self.limit_position(x, y)
         self.canvas.coords(self.id, self.x, self.y)
-        self.canvas.coords(self.sig_plot_id, self.x, self.y)
+        if self.reachable_map is not None:  # shadows no longer match
+            self.set_reachable_map(None)
+        if self.sig_plot_id:  # drawn on the next flush of the scheduler
+            self.canvas.coords(self.sig_plot_id, self.x, self.y)
         if self.outline_id:
             self.canvas.coords(self.outline_id, *self.canvas.bbox(self.id))
+        self.moved()
 
     def _save_editables(self, window):
         changed = not all(
@@ -359,76 +468,93 @@ class BTS(app_object):
         )
         if not super()._save_editables(window):
             return False
+        if window.entries.get("model", self.model_name) != self.model_name:
+            self.model_name = window.entries["model"]
+            changed = True
+        loaded = True
         if "pattern" in window.entries:
-            if not window.entries["pattern"]:
-                self.radiation_pattern = HALF_WAVE_DIPOLE
-            else:
-                with open(window.entries["pattern"], "r") as fp:
-                    self.radiation_pattern = pattern_from_msi_file(fp)
-        elif changed:
+            try:
+                self.set_pattern(window.entries.pop("pattern"))
+                changed = False  # already recalculated
+            except Exception as e:
+                print(f"Can't load the pattern, keeping {self.pattern_id}: {e}")
+                loaded = False
+        if changed:
             self.calc_signal_map()
-        return True
+        return loaded
 
     def _edit_editables(self, window: tk.Toplevel):
         super()._edit_editables(window)
         row = window.grid_size()[1]
+        tk.Label(window, text="model:").grid(row=row, column=1, sticky="W")
+        model = tk.StringVar(value=self.model_name)
+        model_chooser = ttk.Combobox(
+            window, textvariable=model, values=list(MODELS), state="readonly"
+        )
+        model_chooser.grid(row=row, column=2)
+
+        def choose_model(_):
+            window.entries["model"] = model.get()
+
+        model_chooser.bind("<<ComboboxSelected>>", choose_model)
+        row += 1
         frame = tk.LabelFrame(window, relief="ridge", text="Antenna pattern")
         frame.grid(row=row + 1, column=1, columnspan=2, sticky="EW")
-        tk.Label(frame, textvariable=self.antenna_name).grid(row=0, columnspan=3)
+        selected = tk.StringVar(value=self.pattern_id)
+        chooser = ttk.Combobox(
+            frame, textvariable=selected, values=list(PATTERNS), state="readonly"
+        )
+        chooser.grid(row=0, columnspan=3, sticky="EW")
+
+        def choose_pattern(pattern_id: str):
+            window.entries["pattern"] = pattern_id
+            selected.set(pattern_id)
+
+        chooser.bind("<<ComboboxSelected>>", lambda _: choose_pattern(selected.get()))
 
         def file_pattern():
             file = filedialog.askopenfilename(
                 filetypes=[("Radiation pattern files", "*.msi")],
                 title="Select radiation pattern file",
             )
-            window.entries["pattern"] = file
-            self.antenna_name.set(pl.Path(file).name or "half-wave dipole")
+            if file:
+                choose_pattern(PATTERNS.add_file(file))
+                chooser.configure(values=list(PATTERNS))
             window.focus_set()
 
         file_button = tk.Button(frame, text="Loud", command=file_pattern)
         file_button.grid(row=1, column=0, sticky="EW")
 
         def reset_pattern():
-            window.entries["pattern"] = None
-            self.antenna_name.set("half-wave dipole")
+            choose_pattern(DIPOLE_ID)
 
         reset_button = tk.Button(frame, text="Reset", command=reset_pattern)
         reset_button.grid(row=1, column=1, sticky="EW", padx=5)
 
         def preview_pattern():
-            pattern = window.entries.get("pattern", None)
+            pattern_id = selected.get()
 
             def show_pattern(pattern: np.ndarray):
                 fig = plt.figure(1)
                 fig.clear()
                 ax = fig.subplots()
                 angles = np.arange(-180, 181)
-                plt_data: np.ndarray = pattern[0, angles] + pattern[1, angles].reshape(
-                    -1, 1
-                )
+                plt_data = pattern_gain(pattern, angles % 360, angles[:, None] % 360)
                 cax = ax.pcolormesh(
                     angles, angles, plt_data, vmin=max(plt_data.min(), -50)
                 )
                 ax.set_xlabel("Azimuth [deg]")
                 ax.set_ylabel("Elevation [deg]")
                 fig.colorbar(cax, label="Gain [dBi]")
-                ax.set_title(
-                    f"Flattened radiation pattern of {self.antenna_name.get()}"
-                )
+                ax.set_title(f"Flattened radiation pattern of {pattern_id}")
                 fig.tight_layout()
                 fig.show()
 
-            if pattern:
-                try:
-                    with open(pattern, "r") as fp:
-                        show_pattern(
-                            pattern_from_msi_file(fp),
-                        )
-                except Exception as e:
-                    print(e)
-                    return
-            else:
-                show_pattern(HALF_WAVE_DIPOLE)
+            try:
+                show_pattern(PATTERNS[pattern_id])
+            except Exception as e:
+                print(e)
+                return
 
         reset_button = tk.Button(frame, text="Preview", command=preview_pattern)
         reset_button.grid(row=1, column=2, sticky="EW")
@@ -447,27 +573,147 @@ class BTS(app_object):
 
 class Obstacle(app_object):
     size: int = 4
-    _editable = ["size"]
+    height: float = kbsim.raster.OBSTACLE_HEIGHT  # m
+    material: str = "opaque"
+    """Key of `kbsim.MATERIALS`"""
+    _editable = ["size", "height"]
+
+    @property
+    def attenuation(self) -> float:
+        return kbsim.MATERIALS[self.material]
 
     def _save_editables(self, window):
         if not super()._save_editables(window):
             return False
+        self.material = window.entries.get("material", self.material)
         self.set_position(self.x, self.y)
         return True
 
+    def _edit_editables(self, window: tk.Toplevel):
+        super()._edit_editables(window)
+        row = window.grid_size()[1]
+        tk.Label(window, text="material:").grid(row=row, column=1, sticky="W")
+        material = tk.StringVar(value=self.material)
+        chooser = ttk.Combobox(
+            window,
+            textvariable=material,
+            values=list(kbsim.MATERIALS),
+            state="readonly",
+        )
+        chooser.grid(row=row, column=2)
+
+        def choose_material(_):
+            window.entries["material"] = material.get()
+
+        chooser.bind("<<ComboboxSelected>>", choose_material)
+
     def add_self_to_map(self, ob_map: np.ndarray):
-        X, Y = np.ogrid[: ob_map.shape[0], : ob_map.shape[1]]
-        dist = (X - self.x) ** 2 + (Y - self.y) ** 2
-        ob_map[dist <= self.size**2] = 1
+        self.to_engine().add_to_map(ob_map)
+
+    def to_engine(self) -> kbsim.Obstacle:
+        return kbsim.Obstacle(
+            self.name, self.x, self.y, self.size, self.material, self.height
+        )
+
+    @classmethod
+    def from_engine(cls, obstacle: kbsim.Obstacle) -> "Obstacle":
+        obj = cls(obstacle.name)
+        obj.x, obj.y = obstacle.x, obstacle.y
+        obj.size, obj.material, obj.height = (
+            obstacle.size,
+            obstacle.material,
+            obstacle.height,
+        )
+        return obj
+
+
+class object_registry:
+    """Canvas objects indexed by canvas id, name, type and position"""
+
+    def __init__(self, cell: int = 32) -> None:
+        self.by_id: dict[int, app_object] = {}
+        self.by_name: dict[str, dict[app_object, None]] = {}
+        """Objects by name, insertion-ordered dicts used as sets"""
+        self.by_type: dict[type, list[app_object]] = {}
+        self.spatial = kbsim.SpatialIndex(cell)
+        self._names: dict[app_object, str] = {}
+        self._positions: dict[app_object, int] = {}
+        """Position of every object in its `by_type` list"""
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def add(self, obj: app_object):
+        self.by_id[obj.id] = obj
+        same = self.by_type.setdefault(type(obj), [])
+        self._positions[obj] = len(same)
+        same.append(obj)
+        self._index_name(obj)
+        self.moved(obj)
+
+    def remove(self, obj: app_object):
+        self.by_id.pop(obj.id, None)
+        same = self.by_type[type(obj)]
+        i = self._positions.pop(obj)
+        del same[i]
+        for j in range(i, len(same)):  # only the later objects move up
+            self._positions[same[j]] = j
+        self._unindex_name(obj)
+        self.spatial.discard(obj)
+
+    def _index_name(self, obj: app_object):
+        self._names[obj] = obj.name
+        self.by_name.setdefault(obj.name, {})[obj] = None
+
+    def _unindex_name(self, obj: app_object):
+        name = self._names.pop(obj)
+        same = self.by_name[name]
+        del same[obj]
+        if not same:
+            del self.by_name[name]
+
+    def renamed(self, obj: app_object) -> bool:
+        """Reindexes the name of the object, False if it didn't change"""
+        if self._names.get(obj) == obj.name:
+            return False
+        self._unindex_name(obj)
+        self._index_name(obj)
+        return True
+
+    def moved(self, obj: app_object):
+        self.spatial.update(obj, obj.x, obj.y)
+
+    def of_type(self, cls: type) -> list[app_object]:
+        """Objects of a type in the order they were added"""
+        return self.by_type.get(cls, [])
+
+    def index(self, obj: app_object) -> int:
+        """Position of the object among the objects of its type"""
+        return self._positions[obj]
+
+    def find(self, name: str) -> app_object | None:
+        """First added object with the given name"""
+        return next(iter(self.by_name.get(name, ())), None)
+
+    def nearest(self, x: int, y: int, limit: int = 10) -> app_object | None:
+        """Object closest to the point, None if none is within `limit`"""
+        return self.spatial.nearest(x, y, limit)
 
 
 class object_manager(ttk.Frame):
-    objects: list[Type[app_object]] = []
     obj_lists: dict[str, tk.StringVar] = {}
     selected: Type[app_object] = None
 
     def __init__(self, master, canvas: tk.Canvas):
         self.canvas = canvas
+        self.registry = object_registry()
+        self.listboxes: dict[type, tk.Listbox] = {}
+        self.listeners: list[Callable] = []
+        """Called with (event, obj, changed obstacle box) on every change"""
+        self.obstacle_raster = kbsim.ObstacleRaster(*SIM_SIZE)
         super().__init__(master)
 
     def register_class(self, cls: Type[app_object]):
@@ -486,47 +732,117 @@ class object_manager(ttk.Frame):
         listbox = tk.Listbox(frame, listvariable=self.obj_lists[cls.__name__], height=5)
         listbox.grid(row=1, columnspan=2, sticky="NSEW")
         listbox.bind("<Button-1>", self.handle_click)
+        self.listboxes[cls] = listbox
         frame.rowconfigure(1, weight=1)
 
+    def notify(self, event: str, obj, box=None):
+        for listener in self.listeners:
+            listener(event, obj, box)
+
     def object_updated(self, obj):
-        cls = type(obj)
-        self.obj_lists[cls.__name__].set(
-            [str(obj) for obj in self.objects if type(obj) is cls]
-        )
+        if self.registry.renamed(obj):
+            # listboxes sharing the list variable follow this one
+            listbox = self.listboxes[type(obj)]
+            idx = self.registry.index(obj)
+            listbox.delete(idx)
+            listbox.insert(idx, str(obj))
+        self.notify("updated", obj)
 
     def add_new(self, cls: Type[app_object]):
         name = simpledialog.askstring(
             "Object Name", f"Enter name for new {cls.__name__}:"
         )
         if name:
-            obj = cls(name)
-            obj.on_update = self.object_updated
-            self.objects.append(obj)
-            self.object_updated(obj)
-            obj.draw(self.canvas)
+            self.add_object(cls(name))
+
+    def add_object(self, obj: app_object):
+        obj.on_update = self.object_updated
+        obj.on_move = self.object_moved
+        obj.draw(self.canvas)
+        self.registry.add(obj)
+        self.listboxes[type(obj)].insert(tk.END, str(obj))
+        self.object_moved(obj)
+
+    def clear(self):
+        for obj in list(self.registry):
+            self.remove_object(obj)
+
+    def load(self, saved: kbsim.SavedScenario):
+        """Replaces all objects with the ones of a loaded scenario file"""
+        self.clear()
+        sc = saved.scenario
+        for bts, name in zip(sc.base_stations, saved.pattern_names):
+            self.add_object(BTS.from_engine(bts, name))
+        for ue in sc.user_equipment:
+            self.add_object(UE.from_engine(ue))
+        for obstacle in sc.obstacles:
+            self.add_object(Obstacle.from_engine(obstacle))
+
+    def object_moved(self, obj):
+        self.registry.moved(obj)
+        box = None
+        if isinstance(obj, Obstacle):
+            box = self.obstacle_raster.update(
+                obj, obj.x, obj.y, obj.size, obj.attenuation, obj.height
+            )
+            self.invalidate_shadows()
+        self.notify("moved", obj, box)
+
+    def invalidate_shadows(self):
+        for bts in self.registry.of_type(BTS):
+            if bts.reachable_map is not None:
+                bts.set_reachable_map(None)
 
     def remove_object(self, obj: Type[app_object]):
         if not obj:
             return
         obj.delete()
-        self.objects.remove(obj)
-        self.obj_lists[type(obj).__name__].set(
-            [str(o) for o in self.objects if type(o) is type(obj)]
-        )
+        self.listboxes[type(obj)].delete(self.registry.index(obj))
+        self.registry.remove(obj)
+        box = None
+        if isinstance(obj, Obstacle):
+            box = self.obstacle_raster.discard(obj)
+            self.invalidate_shadows()
+        self.notify("removed", obj, box)
         if self.selected is obj:
             self.selected = None
 
     def object_from_attr(
-        self,
-        **kwargs,
-        # id: Optional[int] = None,
-        # name: Optional[str]=None,
+        self, id: Optional[int] = None, name: Optional[str] = None
     ) -> Type[app_object] | None:
-        attr = tuple(kwargs.keys())[0]
-        for obj in self.objects:
-            if getattr(obj, attr) == kwargs[attr]:
-                return obj
-        return None
+        if id is not None:
+            return self.registry.by_id.get(id)
+        return self.registry.find(name)
+
+    def scenario(self, ues: Optional[list[UE]] = None) -> kbsim.Scenario:
+        """Snapshot of the canvas objects as an engine scenario
+
+        Args:
+            ues (list[UE], optional): UEs to include. Defaults to all of them.
+        """
+        if ues is None:
+            ues = self.registry.of_type(UE)
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if self.obstacle_raster.shape != (height, width):
+            self.obstacle_raster.resize(width, height)
+            self.invalidate_shadows()
+        return kbsim.Scenario(
+            width,
+            height,
+            [o.to_engine() for o in self.registry.of_type(BTS)],
+            [ue.to_engine() for ue in ues],
+            [o.to_engine() for o in self.registry.of_type(Obstacle)],
+            self.obstacle_raster.mask,
+            penetration=True,
+            obstacle_loss=self.loss_maps(),
+        )
+
+    def loss_maps(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.obstacle_raster.attenuation, self.obstacle_raster.heights
+
+    def save(self, path: pl.Path):
+        bts = self.registry.of_type(BTS)
+        kbsim.save_scenario(path, self.scenario(), [b.pattern_id for b in bts])
 
     def select_object(self, obj):
         if self.selected and self.selected is not obj:
@@ -548,82 +864,62 @@ class object_manager(ttk.Frame):
         else:
             self.selected.handle_keys(event)
 
-    def find_closest_limited(self, x: int, y: int, limit: int = 10):
-        id = self.canvas.find_closest(x, y)
-        if not id:
-            return None
-        item_coords = self.canvas.coords(id)
-        if not item_coords:
+    def object_at(self, event: tk.Event) -> Type[app_object] | None:
+        """Object under the mouse on the canvas or selected in a listbox"""
+        if event.widget is self.canvas:
+            self.canvas.focus_set()
+            return self.registry.nearest(event.x, event.y)
+        lb: tk.Listbox = event.widget
+        if len(lb.curselection()) == 0:
             return None
-
-        # Calculate the center of the item
-        if len(item_coords) == 4:
-            item_x = (item_coords[0] + item_coords[2]) / 2
-            item_y = (item_coords[1] + item_coords[3]) / 2
-        else:
-            item_x, item_y = item_coords
-        # Calculate the distance between the given coordinates and the item's center
-        distance = np.linalg.norm((item_x - x, item_y - y))
-
-        # Check if the distance is within the specified radius
-        return None if distance > limit else id[0]
+        cls = next(c for c, widget in self.listboxes.items() if widget is lb)
+        return self.registry.of_type(cls)[lb.curselection()[0]]
 
     def handle_click(self, event: tk.Event):
-        if event.widget is self.canvas:
-            self.canvas.focus_set()
-            id = self.find_closest_limited(event.x, event.y)
-            if id is None:
-                return
-            self.select_object(self.object_from_attr(id=id))
-        else:
-            lb: tk.Listbox = event.widget
-            if len(lb.curselection()) == 0:
-                return
-            self.select_object(self.object_from_attr(name=lb.get(lb.curselection()[0])))
+        obj = self.object_at(event)
+        if obj is not None:
+            self.select_object(obj)
 
     def handle_right_click(self, event: tk.Event):
-        if event.widget is self.canvas:
-            self.canvas.focus_set()
-            id = self.find_closest_limited(event.x, event.y)
-            if id is None:
-                return
-            obj = self.select_object(self.object_from_attr(id=id))
-        else:
-            lb: tk.Listbox = event.widget
-            if len(lb.curselection()) == 0:
-                return
-            obj = self.select_object(
-                self.object_from_attr(name=lb.get(lb.curselection()[0]))
-            )
-        if obj:
-            obj.edit()
+        obj = self.object_at(event)
+        if obj is not None:
+            self.select_object(obj).edit()
 
 
 class sim_frame(ttk.Frame):
     OM: object_manager = None
     p_strim = io.StringIO()
+    live: kbsim.LiveSimulation = None
+    live_budget: float = 0.01  # s of simulation per frame
 
     def __init__(self, master, OM: object_manager):
         super().__init__(master)
         self.OM = OM
+        OM.listeners.append(self.object_changed)
         label = ttk.Label(self, text="Simulation", font=("Segoe UI", 14, "bold"))
         label.grid(row=0, column=0, sticky="W")
         add_button = ttk.Button(
             self, text="RUN", command=self.run_sim, width=4, padding=[0]
         )
         add_button.grid(row=0, column=1, sticky="E")
+        self.live_var = tk.BooleanVar(value=False)
+        live_button = ttk.Checkbutton(
+            self, text="Live", variable=self.live_var, command=self.toggle_live
+        )
+        live_button.grid(row=0, column=2, sticky="E")
         lf = ttk.Labelframe(self, text="Select UEs to connect:", relief="sunken")
-        lf.grid(row=1, columnspan=2, pady=5, sticky="EW")
+        lf.grid(row=1, columnspan=3, pady=5, sticky="EW")
         self.listbox = tk.Listbox(
             lf, listvariable=self.OM.obj_lists["UE"], height=5, selectmode=tk.MULTIPLE
         )
+        self.listbox.bind("<<ListboxSelect>>", lambda _: self.toggle_live())
         self.listbox.pack(fill=tk.BOTH)
 
         self.printout = tk.StringVar()
-        self.printout.set("Choose two UEs and press RUN")
+        self.printout.set("Choose UEs and press RUN")
 
         lf = ttk.Labelframe(self, text="Output:", relief="sunken")
-        lf.grid(row=2, columnspan=2, sticky="NSEW")
+        lf.grid(row=2, columnspan=3, sticky="NSEW")
         self.update_idletasks()
         txt = tk.Message(lf, textvariable=self.printout, width=190, anchor="nw")
         txt.pack(fill=tk.BOTH, side=tk.LEFT)
@@ -637,53 +933,80 @@ class sim_frame(ttk.Frame):
         print(*args, file=self.p_strim, **kwargs)
         self.printout.set(self.p_strim.getvalue())
 
+    def selected_ues(self) -> list[UE]:
+        return [
+            self.OM.registry.of_type(UE)[idx] for idx in self.listbox.curselection()
+        ]
+
+    def show_result(self, result: kbsim.SimulationResult):
+        network = result.network()
+        connected = network.connectivity()
+        n_ue = len(result.scenario.user_equipment)
+        n_pairs = n_ue * (n_ue - 1) // 2
+        n_connected = np.count_nonzero(np.triu(connected, 1))
+        self.print(*network.report(), sep="\n")
+        self.print(f"Connected pairs: {n_connected}/{n_pairs}")
+
     def run_sim(self):
         self.print("Starting analysis...", clear=True)
-        ues = self.listbox.curselection()
-        if len(ues) != 2:
-            return self.print("ERR: Select two UEs!")
-        # create obstacle map
-        ob_map = np.zeros(
-            (self.OM.canvas.winfo_height(), self.OM.canvas.winfo_width()), "bool"
+        ues = self.selected_ues()
+        if len(ues) < 2:
+            return self.print("ERR: Select at least two UEs!")
+        # same method as live mode, see `kbsim.LiveSimulation`
+        result = kbsim.simulate(self.OM.scenario(ues))
+        gui_bts = self.OM.registry.of_type(BTS)
+        for bts, engine_bts in zip(gui_bts, result.scenario.base_stations):
+            bts.set_reachable_map(engine_bts.reachable_map)
+
+        # check connections, find routes between all selected UEs
+        self.show_result(result)
+
+    def toggle_live(self):
+        """Starts, restarts or stops the live simulation of the selected UEs"""
+        self.live = None
+        if not self.live_var.get():
+            return
+        ues = self.selected_ues()
+        if len(ues) < 2:
+            return self.print("ERR: Select at least two UEs!", clear=True)
+        self.live = kbsim.LiveSimulation(
+            self.OM.scenario(ues), self.OM.registry.of_type(BTS), ues
         )
-        for obj in filter(lambda o: isinstance(o, Obstacle), self.OM.objects):
-            obj: Obstacle
-            obj.add_self_to_map(ob_map)
-
-        # check bts availability
-        ue1, ue2 = (self.OM.object_from_attr(name=self.listbox.get(idx)) for idx in ues)
-        l_ue1, l_ue2 = list(), list()
-        for bts in filter(lambda o: isinstance(o, BTS), self.OM.objects):
-            bts: BTS
-            if bts.check_signal(ob_map, ue1):
-                l_ue1.append(bts.name)
-            if bts.check_signal(ob_map, ue2):
-                l_ue2.append(bts.name)
-
-        # check connection, optimize route
-        def check_lue(ue, l_ue):
-            if len(l_ue) < 1:
-                self.print(f"ERR: {ue} has no signal!")
-                return False
-            self.print(f"UE {ue} can connect to: {l_ue}")
-            return True
+        self.OM.canvas.scheduler.schedule((self, "live"), self.live_step)
 
-        if not (check_lue(ue1, l_ue1) and check_lue(ue2, l_ue2)):
+    def object_changed(self, event: str, obj: app_object, box=None):
+        if self.live is None:
             return
-
-        self.print("Connection established!")
-        for bts in l_ue1:
-            if bts in l_ue2:
-                self.print(ue1, bts, bts, ue2, sep="->")
-                return
-        self.print(ue1, l_ue1[0], l_ue2[0], ue2, sep="->")
+        if isinstance(obj, Obstacle):
+            self.live.obstacle_changed(box)
+        elif event == "removed":
+            self.live.remove(obj)
+        elif isinstance(obj, BTS):
+            self.live.update_bts(obj, obj.to_engine())
+        elif obj in self.live:
+            self.live.update_ue(obj, obj.to_engine())
+        self.OM.canvas.scheduler.schedule((self, "live"), self.live_step)
+
+    def live_step(self):
+        if self.live is None:
+            return
+        self.live.obstacle_changed(
+            None, self.OM.obstacle_raster.mask, self.OM.loss_maps()
+        )
+        if self.live.step(self.live_budget):
+            self.print("Live analysis:", clear=True)
+            self.show_result(self.live.result())
+        else:  # continue in the next frame
+            self.OM.canvas.scheduler.schedule((self, "live"), self.live_step)
 
 
 class App(ttk.Frame):
     def __init__(self, master: tk.Tk):
         super().__init__(master)
+        PATTERNS.scan(pl.Path(patterns.__file__).parent)
         self.pack(padx=5, pady=5, expand=True, fill=tk.BOTH)
         self.canvas = tk.Canvas(self, bg="white")
+        self.canvas.scheduler = render_scheduler(self.canvas)
         # self.bind("<Configure>", self.resize_canvas)
         self.OM = object_manager(self, self.canvas)
         self.OM.register_class(BTS)
@@ -704,6 +1027,13 @@ class App(ttk.Frame):
         s.pack(side=tk.LEFT, fill=tk.Y, padx=5)
         self.sim.pack(side=tk.RIGHT, fill=tk.Y)
 
+        menubar = tk.Menu(master)
+        file_menu = tk.Menu(menubar)
+        file_menu.add_command(label="Open...", command=self.open_scenario)
+        file_menu.add_command(label="Save as...", command=self.save_scenario)
+        menubar.add_cascade(label="File", menu=file_menu)
+        master.config(menu=menubar)
+
         self.canvas.bind("<Button-1>", self.OM.handle_click)
         self.canvas.bind("<Button-3>", self.OM.handle_right_click)
         self.canvas.bind("<Key>", self.OM.handle_keys)
@@ -718,6 +1048,33 @@ class App(ttk.Frame):
             10 + SIM_SIZE[1],
         )
 
+    def open_scenario(self):
+        file = filedialog.askopenfilename(
+            filetypes=[("Scenario files", "*.json")], title="Open scenario"
+        )
+        if not file:
+            return
+        try:
+            saved = kbsim.load_scenario(file)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            return self.sim.print(f"ERR: Can't open {file}: {e}", clear=True)
+        self.sim.live_var.set(False)
+        self.sim.toggle_live()
+        self.OM.load(saved)
+
+    def save_scenario(self):
+        file = filedialog.asksaveasfilename(
+            filetypes=[("Scenario files", "*.json")],
+            defaultextension=".json",
+            title="Save scenario",
+        )
+        if not file:
+            return
+        try:
+            self.OM.save(pl.Path(file))
+        except OSError as e:
+            self.sim.print(f"ERR: Can't save {file}: {e}", clear=True)
+
 
 if __name__ == "__main__":
     root = tk.Tk()
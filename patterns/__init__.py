@@ -1,17 +1,27 @@
-from vispy.plot import Fig
-from vispy.plot import PlotWidget
+from __future__ import annotations
+
 import numpy as np
 from functools import cache
-import matplotlib.tri as mtri
 import matplotlib
 from typing import TextIO, Optional
 import pathlib as pl
+from .msi import parse_msi, load_msi
+from .sphere import (
+    SPHERE_DTYPE,
+    is_separable,
+    sphere_pattern,
+    pattern_gain,
+    peak_gain,
+    interpolate_row,
+    interpolated_gain,
+)
+from .library import PatternLibrary, DIPOLE_ID
 
 try:
     from vispy.plot import Fig
     from vispy.plot import PlotWidget
 except ImportError:
-    print("Vispy not found, plotting disabled")
+    Fig = None  # optional, `_figure` raises once plotting is requested
 
 # radiation patterns are stored as gain value (in dBi) in 2x360 matrices
 # row 0 stores gain parts for each azimuth, row 1 for each elevation angle from the main radiation direction
@@ -35,24 +45,56 @@ def normalize_linear(x: np.ndarray) -> np.ndarray:
     return (x - np.min(x)) / (np.max(x) - np.min(x))
 
 
-# @cache
+@cache
+def structured_mesh(step: int) -> tuple[np.ndarray, np.ndarray]:
+    """Creates a mesh of a unity sphere sampled every `step` degrees
+
+    The azimuth/elevation grid is regular, so every grid cell is split into two
+    triangles directly instead of triangulating the points.
+
+    Args:
+        step (int): angular step in degrees
+
+    Returns:
+        (np.ndarray,np.ndarray): read-only vertices (Nv,3) and faces(Nf,3) of the mesh
+    """
+    rads = np.radians(np.arange(-180, 181, step))
+    n = len(rads)
+    azimuth, elevation = np.meshgrid(rads, rads)
+    vertices = np.stack(
+        [
+            np.cos(elevation) * np.cos(azimuth),
+            np.cos(elevation) * np.sin(azimuth),
+            np.sin(elevation),
+        ],
+        axis=-1,
+    ).reshape(-1, 3)
+    # top-left vertex of every grid cell
+    v = (np.arange(n - 1)[:, None] * n + np.arange(n - 1)[None, :]).reshape(-1, 1)
+    faces = np.hstack([v, v + 1, v + n, v + 1, v + n + 1, v + n]).reshape(-1, 3)
+    faces = faces.astype(np.uint32)
+    vertices.flags.writeable = False
+    faces.flags.writeable = False
+    return vertices, faces
+
+
 def generate_mesh(angles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
     """Creates a mesh of a unity sphere with the given angles
 
     Args:
-        angles (np.ndarray): a vector of angles in degrees
+        angles (np.ndarray): evenly spaced angles in degrees, from -180 to 180
 
     Returns:
         (np.ndarray,np.ndarray): vertices (Nv,3) and faces(Nf,3) of the mesh
     """
-    rads = np.radians(angles)
-    azimuth, elevation = np.meshgrid(rads, rads)
-    tri = mtri.Triangulation(azimuth.flatten(), elevation.flatten())
-    vol = np.empty((3, *angles.shape * 2))
-    vol[0] = np.cos(elevation) * np.cos(azimuth)
-    vol[1] = np.cos(elevation) * np.sin(azimuth)
-    vol[2] = np.sin(elevation)
-    return vol.reshape(3, -1).T, tri.triangles
+    return structured_mesh(int(angles[1] - angles[0]))
+
+
+def _figure(**kwargs) -> Fig:
+    """Creates a vispy figure, raising ImportError if vispy isn't installed"""
+    if Fig is None:
+        raise ImportError("Vispy is required for plotting, install it to plot patterns")
+    return Fig(show=False, **kwargs)
 
 
 def visualize_pattern(
@@ -60,6 +102,9 @@ def visualize_pattern(
 ) -> None | Fig:
     """Displays a 3D plot of a radiation pattern
 
+    Plotting into a widget which already shows a pattern only updates the
+    vertices and colours of its mesh.
+
     Args:
         pattern (np.ndarray): array (2,N) of gain values
         plot (PlotWidget, optional): parent plotwidget for the mesh.
@@ -70,27 +115,30 @@ def visualize_pattern(
         None | Fig: created figure if plot is None, else None
     """
     if plot is None:
-        fig = Fig(show=False)
+        fig = _figure()
         ax: PlotWidget = fig[0, 0]
     else:
         ax = plot
 
     step = 360 // pattern.shape[1]
     angles = np.arange(-180, 181, step)
-    plt_data: np.ndarray = pattern[0, angles // step] + pattern[
-        1, angles // step
-    ].reshape(-1, 1)
+    idx = (angles // step) % pattern.shape[1]
+    plt_data = pattern_gain(pattern, idx, idx.reshape(-1, 1))
     plt_data = plt_data.flatten().astype(np.float32)
     plt_data = np.clip(plt_data, -80, 100)
     # clim = (plt_data.min(), plt_data.max())
     plt_data -= plt_data.min()
     colour = matplotlib.colormaps[cmap](plt_data / plt_data.max())
 
-    vertices, faces = generate_mesh(angles)
-    vertices *= plt_data.reshape(-1, 1)
+    unit, faces = structured_mesh(step)
+    vertices = unit * plt_data.reshape(-1, 1)
 
-    ax.title.text = "3D radiation pattern"
-    ax.mesh(vertices=vertices, faces=faces, vertex_colors=colour)
+    mesh = getattr(ax, "pattern_mesh", None)
+    if mesh is None:
+        ax.title.text = "3D radiation pattern"
+        ax.pattern_mesh = ax.mesh(vertices=vertices, faces=faces, vertex_colors=colour)
+    else:
+        mesh.set_data(vertices=vertices, faces=faces, vertex_colors=colour)
     # colorbar isn't visualized correctly, so skip for now
     # ax.colorbar(clim=clim, cmap=cmap, position='right',label='Gain [dBi]')
     return fig if plot is None else None
@@ -110,16 +158,15 @@ def plot_flat_pattern(
         None | Fig: created figure if plot is None, else None
     """
     if plot is None:
-        fig = Fig(show=False)
+        fig = _figure()
         ax: PlotWidget = fig[0, 0]
     else:
         ax = plot
 
     step = 360 // pattern.shape[1]
     angles = np.arange(-180, 181, step)
-    plt_data: np.ndarray = pattern[0, angles // step] + pattern[
-        1, angles // step
-    ].reshape(-1, 1)
+    idx = (angles // step) % pattern.shape[1]
+    plt_data = pattern_gain(pattern, idx, idx.reshape(-1, 1))
     plt_data = np.clip(plt_data.astype(np.float32), -80, 100)
     clim = (plt_data.min(), plt_data.max())
     ax.image(plt_data, cmap=cmap)
@@ -129,29 +176,13 @@ def plot_flat_pattern(
     ax.ylabel.text = "Elevation [deg]"
     return fig if plot is None else None
 
-def pattern_from_msi_file(fp: TextIO) -> np.ndarray:  # simple parser
-    gain = 0.0
-    pattern = np.empty((2, 360))  # assume 360 points in file from 0 to 359 degrees
-    reading_index = -1
-    for line in fp.readlines():
-        if line.startswith("GAIN"):
-            gain = float(line.split()[1])
-        elif line.startswith("HORIZONTAL"):
-            reading_index = 0
-            i = 0
-        elif line.startswith("VERTICAL"):
-            reading_index = 1
-            i = 0
-        elif reading_index != -1:
-            pattern[reading_index, i] = -float(line.split()[1])
-            i += 1
-    if reading_index == -1:
-        raise ValueError("Invalid file format")
-    return pattern + gain / 2
+def pattern_from_msi_file(fp: TextIO) -> np.ndarray:
+    """Parses an open MSI file, see `msi.parse_msi`"""
+    return parse_msi(fp.read())
 
 
 def demo():
-    fig = Fig(show=False, title="Radiation patterns demo")
+    fig = _figure(title="Radiation patterns demo")
 
     visualize_pattern(HALF_WAVE_DIPOLE, fig[1, 0])
     plot_flat_pattern(HALF_WAVE_DIPOLE, fig[1, 1])
@@ -0,0 +1,193 @@
+"""Catalog of antenna patterns shared by many base stations.
+
+Base stations refer to patterns by ID. A directory scan only reads and hashes
+the files (in a thread pool), parsing happens on first use. Identical
+patterns, whether from identical files or not, share one read-only array.
+"""
+
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+import pathlib as pl
+import threading
+import numpy as np
+from . import msi
+from .sphere import is_separable
+
+DIPOLE_ID = "half-wave dipole"
+"""ID of the built-in `HALF_WAVE_DIPOLE` pattern"""
+
+
+class PatternFile(NamedTuple):
+    path: pl.Path
+    key: str
+    """Hash of the file contents, see `msi.content_key`"""
+    header: dict[str, str]
+
+
+def _scan_file(path: pl.Path) -> PatternFile:
+    data = path.read_bytes()
+    return PatternFile(
+        path, msi.content_key(data), msi.parse_header(data.decode(errors="replace"))
+    )
+
+
+def _array_key(pattern: np.ndarray) -> str:
+    """Content hash of a pattern, separable ones are compared as float64"""
+    from kbsim.cache import array_hash  # kbsim imports this package
+
+    if is_separable(pattern):
+        pattern = np.asarray(pattern, dtype=np.float64)
+    return array_hash(pattern)
+
+
+class PatternLibrary:
+    """Antenna patterns by ID, parsed lazily and deduplicated
+
+    Args:
+        cache_dir (Path, optional): `.npy` cache of parsed files, see
+        `msi.load_msi`. Defaults to `msi.CACHE_DIR`.
+    """
+
+    def __init__(self, cache_dir: Optional[pl.Path] = msi.CACHE_DIR) -> None:
+        from . import HALF_WAVE_DIPOLE
+
+        self.cache_dir = cache_dir
+        self.files: dict[str, PatternFile] = {}
+        self._patterns: dict[str, np.ndarray] = {}
+        self._shared: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self.add(DIPOLE_ID, HALF_WAVE_DIPOLE)
+
+    def __contains__(self, pattern_id: str) -> bool:
+        return pattern_id in self._patterns or pattern_id in self.files
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._patterns
+        yield from (i for i in self.files if i not in self._patterns)
+
+    def __len__(self) -> int:
+        return len(self._patterns.keys() | self.files.keys())
+
+    def __getitem__(self, pattern_id: str) -> np.ndarray:
+        return self.get(pattern_id)
+
+    def _share(self, pattern: np.ndarray) -> np.ndarray:
+        """Returns the stored array equal to `pattern`, storing it if new"""
+        key = _array_key(pattern)
+        shared = self._shared.get(key)
+        if shared is None:
+            if is_separable(pattern):
+                pattern = np.asarray(pattern, dtype=np.float64)
+            shared = np.array(pattern)
+            shared.flags.writeable = False
+            self._shared[key] = shared
+        return shared
+
+    def add(self, pattern_id: str, pattern: np.ndarray) -> np.ndarray:
+        """Registers an already loaded pattern, separable or full-sphere
+
+        Returns:
+            np.ndarray: the shared read-only copy of the pattern
+        """
+        with self._lock:
+            self._patterns[pattern_id] = self._share(pattern)
+            return self._patterns[pattern_id]
+
+    def _register(self, entry: PatternFile, pattern_id: Optional[str] = None) -> str:
+        """Adds a scanned file under a free ID, reusing the ID of identical files"""
+        if pattern_id is not None:
+            if pattern_id in self:
+                raise ValueError(f"Pattern ID {pattern_id!r} is already taken")
+        else:
+            pattern_id = entry.path.stem
+            known = self.files.get(pattern_id)
+            if known is not None and known.key == entry.key:
+                return pattern_id
+            if pattern_id in self:  # a different pattern of the same name
+                pattern_id = f"{pattern_id} ({entry.key[:8]})"
+                if pattern_id in self:
+                    return pattern_id
+        self.files[pattern_id] = entry
+        return pattern_id
+
+    def add_file(self, path: pl.Path, pattern_id: Optional[str] = None) -> str:
+        """Registers an MSI file without parsing it
+
+        Patterns in use are never replaced: a taken file name gets the hash of
+        the contents appended.
+
+        Args:
+            path (Path): MSI file
+            pattern_id (str, optional): ID of the pattern. Defaults to the file
+            name without the suffix.
+
+        Raises:
+            ValueError: if `pattern_id` is already taken
+
+        Returns:
+            str: ID of the pattern
+        """
+        entry = _scan_file(pl.Path(path))
+        with self._lock:
+            return self._register(entry, pattern_id)
+
+    def scan(self, directory: pl.Path, workers: Optional[int] = None) -> list[str]:
+        """Registers all `.msi` files of a directory, reading them in parallel
+
+        Returns:
+            list[str]: IDs of the found patterns, named after the files, see
+            `add_file`
+        """
+        paths = sorted(pl.Path(directory).glob("*.msi"))
+        with ThreadPoolExecutor(workers) as pool:
+            entries = list(pool.map(_scan_file, paths))
+        with self._lock:
+            return [self._register(entry) for entry in entries]
+
+    def remove(self, pattern_id: str):
+        """Unregisters a pattern, e.g. a file that can't be parsed"""
+        with self._lock:
+            self.files.pop(pattern_id, None)
+            self._patterns.pop(pattern_id, None)
+
+    def get(self, pattern_id: str) -> np.ndarray:
+        """Returns the pattern, parsing its file on first use
+
+        Raises:
+            KeyError: if the ID is unknown
+        """
+        pattern = self._patterns.get(pattern_id)
+        if pattern is not None:
+            return pattern
+        with self._lock:
+            entry = self.files[pattern_id]
+            # files with identical contents are parsed once
+            parsed = next(
+                (
+                    self._patterns[other_id]
+                    for other_id, other in self.files.items()
+                    if other.key == entry.key and other_id in self._patterns
+                ),
+                None,
+            )
+        if parsed is None:
+            parsed = msi.load_msi(entry.path, self.cache_dir)
+        return self.add(pattern_id, parsed)
+
+    def id_of(self, pattern: np.ndarray) -> Optional[str]:
+        """ID of a loaded pattern equal to the given one, None if there is none"""
+        pattern = np.asarray(pattern)
+        key = _array_key(pattern)
+        with self._lock:
+            shared = self._shared.get(key)
+            for pattern_id, p in self._patterns.items():
+                if p is shared:
+                    return pattern_id
+            # a lower precision copy of a registered pattern, e.g. float32
+            for pattern_id, p in self._patterns.items():
+                if p.shape == pattern.shape and np.array_equal(
+                    p.astype(pattern.dtype), pattern
+                ):
+                    return pattern_id
+        return None
@@ -0,0 +1,129 @@
+"""Loader of MSI (Planet) antenna pattern files.
+
+Each plane is parsed as one block with NumPy instead of line by line, and
+resampled to the whole degrees used by the simulator, so files with any
+angular step can be used. Parsed patterns are cached in memory and as `.npy`
+files keyed by the hash of the file contents, so reloading an antenna catalog
+skips parsing altogether.
+"""
+
+from typing import Optional
+import hashlib
+import pathlib as pl
+import numpy as np
+
+POINTS = 360
+"""Internal pattern resolution, one point per degree"""
+CACHE_DIR = pl.Path.home() / ".cache" / "kb_simulator" / "patterns"
+"""Default directory of the `.npy` cache"""
+_VERSION = b"msi-1"  # change when the parsed output changes
+_PLANES = {"HORIZONTAL": 0, "VERTICAL": 1}
+_LOADED: dict[str, np.ndarray] = {}
+
+
+def _header_value(line: str) -> str:
+    parts = line.split(maxsplit=1)
+    return parts[1].strip() if len(parts) > 1 else ""
+
+
+def content_key(data: bytes) -> str:
+    """Cache key of the raw contents of an MSI file"""
+    return hashlib.blake2b(_VERSION + data, digest_size=16).hexdigest()
+
+
+def parse_header(text: str) -> dict[str, str]:
+    """Header fields (NAME, FREQUENCY, GAIN, ...) of an MSI file"""
+    header = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        keyword = line.split(maxsplit=1)[0].upper()
+        if keyword in _PLANES:
+            break
+        header[keyword] = _header_value(line)
+    return header
+
+
+def parse_msi(text: str) -> np.ndarray:
+    """Parses the contents of an MSI file
+
+    Args:
+        text (str): file contents
+
+    Raises:
+        ValueError: if a plane is missing or its point count is missing or
+        doesn't match
+
+    Returns:
+        np.ndarray: (2, 360) pattern in dBi, see `HALF_WAVE_DIPOLE`
+    """
+    lines = text.splitlines()
+    gain = 0.0
+    pattern = np.empty((2, POINTS))
+    found = [False, False]
+    i = 0
+    while i < len(lines):
+        keyword = lines[i].split(maxsplit=1)[0].upper() if lines[i].strip() else ""
+        if keyword == "GAIN":
+            value, *unit = _header_value(lines[i]).split()
+            gain = float(value)
+            if unit and unit[0].lower() == "dbd":
+                gain += 2.15
+        elif keyword in _PLANES:
+            fields = _header_value(lines[i]).split()
+            try:
+                n = int(fields[0])
+            except (IndexError, ValueError):
+                raise ValueError(
+                    f"Line {i + 1}: {keyword} needs a point count"
+                ) from None
+            block = lines[i + 1 : i + 1 + n]
+            try:
+                data = np.loadtxt(block, ndmin=2, usecols=(0, 1))
+            except ValueError as e:
+                raise ValueError(f"Invalid {keyword} block: {e}") from None
+            if len(data) != n:
+                raise ValueError(f"{keyword} declares {n} points, found {len(data)}")
+            row = _PLANES[keyword]
+            pattern[row] = -np.interp(
+                np.arange(POINTS), data[:, 0], data[:, 1], period=360
+            )
+            found[row] = True
+            i += n
+        i += 1
+    if not all(found):
+        raise ValueError("Invalid file format")
+    return pattern + gain / 2
+
+
+def load_msi(path: pl.Path, cache_dir: Optional[pl.Path] = CACHE_DIR) -> np.ndarray:
+    """Loads an MSI file, reusing previously parsed identical contents
+
+    Args:
+        path (Path): MSI file
+        cache_dir (Path, optional): directory of the `.npy` cache, None
+        disables it. Defaults to `CACHE_DIR`.
+
+    Returns:
+        np.ndarray: read-only (2, 360) pattern, shared by identical files
+    """
+    data = pl.Path(path).read_bytes()
+    key = content_key(data)
+    if key in _LOADED:
+        return _LOADED[key]
+    cached = None if cache_dir is None else pl.Path(cache_dir) / f"{key}.npy"
+    try:
+        pattern = np.load(cached)
+        if pattern.shape != (2, POINTS):
+            raise ValueError(f"cached pattern has shape {pattern.shape}")
+    except (OSError, ValueError, TypeError):
+        pattern = parse_msi(data.decode(errors="replace"))
+        if cached is not None:
+            try:
+                cached.parent.mkdir(parents=True, exist_ok=True)
+                np.save(cached, pattern)
+            except OSError:
+                pass  # read-only cache, parse again next time
+    pattern.flags.writeable = False
+    _LOADED[key] = pattern
+    return pattern
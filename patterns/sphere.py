@@ -0,0 +1,87 @@
+"""Lookup of both radiation pattern formats.
+
+Patterns are normally separable (2,360) arrays, see `HALF_WAVE_DIPOLE`. Measured
+3D patterns can't be split into the two rows, they are stored as full-sphere
+360x360 matrices indexed [elevation, azimuth] in a compact dtype instead.
+"""
+
+import numpy as np
+
+SPHERE_DTYPE = np.float16
+"""Storage type of full-sphere patterns, keeps gains to about 0.03 dB"""
+
+
+def is_separable(pattern: np.ndarray) -> bool:
+    """True for (2,360) patterns, False for full-sphere (360,360) ones"""
+    return pattern.shape == (2, 360)
+
+
+def sphere_pattern(pattern: np.ndarray, dtype=SPHERE_DTYPE) -> np.ndarray:
+    """Converts a pattern to a full-sphere (360,360) matrix [elevation, azimuth]"""
+    if is_separable(pattern):
+        pattern = pattern[1][:, None] + pattern[0][None, :]
+    if pattern.shape != (360, 360):
+        raise ValueError(f"Invalid pattern shape {pattern.shape}")
+    return pattern.astype(dtype)
+
+
+def pattern_gain(
+    pattern: np.ndarray, azimuth: np.ndarray, elevation: np.ndarray
+) -> np.ndarray:
+    """Gain in dBi of either pattern format
+
+    Args:
+        pattern (np.ndarray): (2,360) or full-sphere (360,360) pattern
+        azimuth (np.ndarray), elevation (np.ndarray): broadcastable integer
+        angles in degrees, within 0..359
+
+    Returns:
+        np.ndarray: float64 gain
+    """
+    if is_separable(pattern):
+        return pattern[0, azimuth] + pattern[1, elevation]
+    return pattern[elevation, azimuth].astype(np.float64)
+
+
+def interpolate_row(row: np.ndarray, index: np.ndarray, weight: np.ndarray):
+    """Linear interpolation of a 360-point pattern row
+
+    Args:
+        row (np.ndarray): gain of every whole degree
+        index (np.ndarray): whole degree below the angle, within 0..359
+        weight (np.ndarray): fraction of a degree above `index`, in <0, 1>
+    """
+    slope = np.roll(row, -1) - row
+    return row[index] + weight * slope[index]
+
+
+def interpolated_gain(
+    pattern: np.ndarray,
+    azimuth: np.ndarray,
+    azimuth_weight: np.ndarray,
+    elevation: np.ndarray,
+    elevation_weight: np.ndarray,
+) -> np.ndarray:
+    """Gain between the whole-degree points of either pattern format
+
+    Separable patterns are interpolated linearly along each row, full-sphere
+    ones bilinearly. Angles are split as in `interpolate_row`.
+    """
+    if is_separable(pattern):
+        return interpolate_row(pattern[0], azimuth, azimuth_weight) + interpolate_row(
+            pattern[1], elevation, elevation_weight
+        )
+    p = pattern.astype(np.float64)
+    a1, e1 = (azimuth + 1) % 360, (elevation + 1) % 360
+    low = p[elevation, azimuth] + azimuth_weight * (
+        p[elevation, a1] - p[elevation, azimuth]
+    )
+    high = p[e1, azimuth] + azimuth_weight * (p[e1, a1] - p[e1, azimuth])
+    return low + elevation_weight * (high - low)
+
+
+def peak_gain(pattern: np.ndarray) -> float:
+    """Highest gain of the pattern in dBi"""
+    if is_separable(pattern):
+        return float(np.max(pattern[0]) + np.max(pattern[1]))
+    return float(np.max(pattern))